@@ -1,2 +1,3 @@
-from .stack import Stack  # noqa: F401
+from .api import run_test  # noqa: F401
+from .stack import FixtureStacks, Stack, TestResult  # noqa: F401
 from .version import __version__  # noqa: F401
@@ -0,0 +1,55 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from .stack import Stack
+
+
+def run_test(
+    template_file,
+    stack_name=None,
+    stack_tags=None,
+    capabilities=None,
+    delete_stack=Stack.DELETE_STACK_DEFAULT,
+    trigger_rule_evaluation=False,
+    template_bucket=None,
+    template_prefix=Stack.TEMPLATE_PREFIX_DEFAULT,
+    latency_history=None,
+    run_state_file=None,
+    resume=False,
+    fixture_outputs=None,
+    max_api_calls=None,
+    skip_preflight=False,
+    rule_code=None,
+    on_deploy_failure=Stack.ON_DEPLOY_FAILURE_DEFAULT,
+    clients=None,
+):
+    """Run a critter test in-process and return a TestResult.
+
+    Options mirror the critter command line arguments. `clients` optionally maps service names ("sts",
+    "cloudformation", "config", "s3") to boto3 clients shared between tests; missing clients are created and added
+    to it. `fixture_outputs` maps the outputs of shared fixture stacks (see FixtureStacks.deploy()) to the test
+    stack parameters with the same names. `rule_code` maps Config rule names ("" for every tested custom Lambda
+    rule) to the Lambda function code pushed before testing them.
+    """
+
+    stack = Stack()
+    stack.configure(
+        template_file,
+        stack_name=stack_name,
+        stack_tags=stack_tags,
+        capabilities=capabilities,
+        delete_stack=delete_stack,
+        trigger_rule_evaluation=trigger_rule_evaluation,
+        template_bucket=template_bucket,
+        template_prefix=template_prefix,
+        latency_history=latency_history,
+        run_state_file=run_state_file,
+        resume=resume,
+        fixture_outputs=fixture_outputs,
+        max_api_calls=max_api_calls,
+        skip_preflight=skip_preflight,
+        rule_code=rule_code,
+        on_deploy_failure=on_deploy_failure,
+    )
+    stack.initialize_boto_clients(clients)
+    return stack.run()
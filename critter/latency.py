@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import datetime
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+# Metric name -> (start timestamp, end timestamp) recorded for each evaluated resource
+LATENCY_METRICS = {
+    "recording": ("last_stack_event_timestamp", "configuration_item_capture_time"),
+    "invocation": ("configuration_item_capture_time", "config_rule_invoked_time"),
+    "evaluation": ("config_rule_invoked_time", "result_recorded_time"),
+    "total": ("last_stack_event_timestamp", "result_recorded_time"),
+}
+PERCENTILES = [50, 90, 100]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+class LatencyReport:
+    """Per-rule latency percentiles of the resources evaluated during a critter test"""
+
+    def __init__(self, config_rule_name, timestamps):
+        """timestamps is a list of dicts, one per resource, keyed by the timestamp names in LATENCY_METRICS"""
+        self.config_rule_name = config_rule_name
+        self.latencies = {metric: [] for metric in LATENCY_METRICS}
+        for resource_timestamps in timestamps:
+            for metric, (start, end) in LATENCY_METRICS.items():
+                if resource_timestamps.get(start) and resource_timestamps.get(end):
+                    seconds = (resource_timestamps[end] - resource_timestamps[start]).total_seconds()
+                    self.latencies[metric].append(seconds)
+
+    def percentiles(self):
+        return {
+            metric: {f"p{pct}": percentile(values, pct) for pct in PERCENTILES}
+            for metric, values in self.latencies.items()
+            if values
+        }
+
+    def log(self):
+        lines = [f"Config rule '{self.config_rule_name}' evaluation latency (seconds):"]
+        for metric, values in self.percentiles().items():
+            lines.append(f"\t{metric + ':':<12} " + "  ".join([f"{k}={v:.1f}" for k, v in values.items()]))
+        logger.info("\n".join(lines))
+
+
+class LatencyHistory:
+    """Local JSON lines store of latency reports, used to detect rules that are getting slower"""
+
+    # Minimum number of previous runs before regressions are reported
+    MIN_HISTORY = 3
+    REGRESSION_FACTOR = 2
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, config_rule_name):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        return [e for e in entries if e["config_rule_name"] == config_rule_name]
+
+    def append(self, report, stack_name):
+        entry = {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "config_rule_name": report.config_rule_name,
+            "stack_name": stack_name,
+            "latency": report.percentiles(),
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def regressions(self, report):
+        """Return the metrics whose p90 exceeds REGRESSION_FACTOR times the median p90 of previous runs"""
+
+        history = self.load(report.config_rule_name)
+        if len(history) < self.MIN_HISTORY:
+            return []
+
+        regressions = []
+        for metric, values in report.percentiles().items():
+            previous = [e["latency"][metric]["p90"] for e in history if metric in e["latency"]]
+            if len(previous) < self.MIN_HISTORY:
+                continue
+            baseline = percentile(previous, 50)
+            if values["p90"] > baseline * self.REGRESSION_FACTOR:
+                regressions.append(
+                    f"{metric} p90 {values['p90']:.1f}s is more than {self.REGRESSION_FACTOR}x the median "
+                    f"of {len(previous)} previous runs ({baseline:.1f}s)"
+                )
+        return regressions
@@ -0,0 +1,291 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""pytest plugin that collects critter test CloudFormation templates as test items.
+
+The plugin needs pytest 7.0 or later and is not registered on install. Load it with `-p critter.pytest_plugin`, then
+enable collection with `pytest --critter --critter-testpath <dir>`, or list the template directories in the
+`critter_testpaths` ini option. Only templates inside those directories are collected, each becomes one test item
+deployed as a stack named after its path relative to the pytest rootdir. Fixture templates given with
+`--critter-fixture` or the `critter_fixtures` ini option are deployed once per session (per pytest-xdist worker)
+before the first critter test and deleted after the last one. boto3 clients are
+shared by every test in the session (one set per pytest-xdist worker), so templates can run in parallel with
+`pytest --critter -n <workers>`.
+"""
+
+import fnmatch
+import re
+import traceback
+import pytest
+
+from . import api
+from .stack import FixtureStacks, Stack, TestFailure
+
+CLIENTS_KEY = pytest.StashKey[dict]()
+FIXTURES_KEY = pytest.StashKey[FixtureStacks]()
+# False once a critter test using the fixture stacks failed
+FIXTURES_PASSED_KEY = pytest.StashKey[bool]()
+
+
+class CritterTestFailed(Exception):
+    def __init__(self, result):
+        super().__init__(result)
+        self.result = result
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("critter", "AWS Config rule integration testing")
+    group.addoption(
+        "--critter",
+        action="store_true",
+        dest="critter",
+        help="Collect critter test CloudFormation templates as test items",
+    )
+    group.addoption(
+        "--critter-testpath",
+        action="append",
+        default=[],
+        metavar="DIR",
+        dest="critter_testpaths",
+        help="Directory containing critter test templates, may be specified multiple times (overrides the "
+        "'critter_testpaths' ini option)",
+    )
+    group.addoption(
+        "--critter-fixture",
+        action="append",
+        default=[],
+        metavar="TEMPLATE",
+        dest="critter_fixtures",
+        help="CloudFormation template of shared dependencies deployed once per session, its outputs are passed to "
+        "the test stack parameters with the same names. May be specified multiple times (overrides the "
+        "'critter_fixtures' ini option)",
+    )
+    group.addoption(
+        "--critter-trigger-rule-evaluation",
+        action="store_true",
+        dest="critter_trigger_rule_evaluation",
+        help="Trigger Config rule evaluation after each test stack deployment",
+    )
+    group.addoption(
+        "--critter-capabilities",
+        action="append",
+        default=[],
+        metavar="CAPABILITY",
+        dest="critter_capabilities",
+        help="CloudFormation capability needed to deploy the test stacks, may be specified multiple times",
+    )
+    group.addoption(
+        "--critter-delete-stack",
+        default=Stack.DELETE_STACK_DEFAULT,
+        choices=Stack.DELETE_STACK_CHOICES,
+        dest="critter_delete_stack",
+        help=f"Test outcome that should trigger CloudFormation stack delete (default: {Stack.DELETE_STACK_DEFAULT})",
+    )
+    group.addoption(
+        "--critter-on-deploy-failure",
+        default=Stack.ON_DEPLOY_FAILURE_DEFAULT,
+        choices=Stack.ON_DEPLOY_FAILURE_CHOICES,
+        dest="critter_on_deploy_failure",
+        help="Delete a test stack whose creation failed, or keep it for debugging "
+        f"(default: {Stack.ON_DEPLOY_FAILURE_DEFAULT})",
+    )
+    group.addoption(
+        "--critter-template-bucket",
+        metavar="BUCKET",
+        dest="critter_template_bucket",
+        help="Upload test templates to this S3 bucket under a content hash key and deploy them with TemplateURL",
+    )
+    group.addoption(
+        "--critter-latency-history",
+        metavar="FILE",
+        dest="critter_latency_history",
+        help="Append Config rule evaluation latency percentiles to this JSON lines file",
+    )
+    group.addoption(
+        "--critter-rule-code",
+        action="append",
+        default=[],
+        metavar="[RULE_NAME=]DIR",
+        dest="critter_rule_code",
+        help="Push the Lambda function code in DIR to the tested custom Config rule(s) and re-trigger their "
+        "evaluation. Unchanged code is skipped by code hash. May be specified multiple times",
+    )
+    group.addoption(
+        "--critter-skip-preflight",
+        action="store_true",
+        dest="critter_skip_preflight",
+        help="Skip checking the AWS Config recorder and Config rules before deploying each test stack",
+    )
+    group.addoption(
+        "--critter-max-api-calls",
+        type=int,
+        metavar="COUNT",
+        dest="critter_max_api_calls",
+        help="Fail a critter test that makes more AWS api calls than COUNT",
+    )
+    parser.addini(
+        "critter_testpaths",
+        type="paths",
+        default=[],
+        help="Directories containing critter test templates, relative to the ini file",
+    )
+    parser.addini(
+        "critter_fixtures",
+        type="paths",
+        default=[],
+        help="Fixture stack templates deployed once per session, relative to the ini file",
+    )
+    parser.addini(
+        "critter_template_patterns",
+        type="args",
+        default=["*.yml", "*.yaml"],
+        help="Glob patterns of file names collected as critter test templates",
+    )
+
+
+def critter_testpaths(config):
+    testpaths = [config.invocation_params.dir / p for p in config.getoption("critter_testpaths")]
+    return [p.resolve() for p in testpaths or config.getini("critter_testpaths")]
+
+
+def critter_fixtures(config):
+    fixtures = [config.invocation_params.dir / p for p in config.getoption("critter_fixtures")]
+    return [p.resolve() for p in fixtures or config.getini("critter_fixtures")]
+
+
+def critter_rule_code(config):
+    rule_code = {}
+    for code in config.getoption("critter_rule_code"):
+        config_rule_name, _, code_dir = code.rpartition("=")
+        rule_code[config_rule_name.strip()] = str(config.invocation_params.dir / code_dir)
+    return rule_code
+
+
+def pytest_configure(config):
+    if config.getoption("critter") and not critter_testpaths(config):
+        raise pytest.UsageError(
+            "critter test templates must be listed explicitly with '--critter-testpath' or the 'critter_testpaths' "
+            "ini option"
+        )
+
+    fixture_templates = critter_fixtures(config) if config.getoption("critter") else []
+    if fixture_templates:
+        # Every pytest-xdist worker deploys its own fixture stacks
+        worker_suffix = f"-{config.workerinput['workerid']}" if hasattr(config, "workerinput") else ""
+        config.stash[FIXTURES_KEY] = FixtureStacks(
+            fixture_templates,
+            stack_names=[
+                stack_name_from_path(t, config.rootpath, Stack.FIXTURE_STACK_NAME_PREFIX) + worker_suffix
+                for t in fixture_templates
+            ],
+            clients=config.stash.setdefault(CLIENTS_KEY, {}),
+            capabilities=config.getoption("critter_capabilities"),
+            delete_stack=config.getoption("critter_delete_stack"),
+            template_bucket=config.getoption("critter_template_bucket"),
+            on_deploy_failure=config.getoption("critter_on_deploy_failure"),
+        )
+        config.stash[FIXTURES_PASSED_KEY] = True
+
+
+def pytest_sessionfinish(session):
+    fixtures = session.config.stash.get(FIXTURES_KEY, None)
+    if fixtures:
+        fixtures.teardown(session.config.stash[FIXTURES_PASSED_KEY])
+
+
+def pytest_collect_file(file_path, parent):
+    config = parent.config
+    if not config.getoption("critter"):
+        return None
+    resolved = file_path.resolve()
+    if not any(p == resolved or p in resolved.parents for p in critter_testpaths(config)):
+        return None
+    if any(fnmatch.fnmatch(file_path.name, pattern) for pattern in config.getini("critter_template_patterns")):
+        return CritterTemplate.from_parent(parent, path=file_path)
+    return None
+
+
+def stack_name_from_path(path, rootpath, prefix="Critter-"):
+    """Derive a CloudFormation stack name that is unique per template path"""
+
+    try:
+        relative = path.resolve().relative_to(rootpath.resolve())
+    except ValueError:
+        relative = path
+    name = re.sub(r"[^a-zA-Z0-9]+", "-", str(relative.with_suffix(""))).strip("-")
+    # Stack names are limited to 128 characters
+    return (prefix + name)[:128]
+
+
+@pytest.fixture(scope="session")
+def critter_clients(pytestconfig):
+    """boto3 clients shared by every critter test in the session. Pass as `clients` to critter.run_test()."""
+    return pytestconfig.stash.setdefault(CLIENTS_KEY, {})
+
+
+class CritterTemplate(pytest.File):
+    def collect(self):
+        yield CritterItem.from_parent(self, name=self.path.stem)
+
+
+class CritterItem(pytest.Item):
+    def runtest(self):
+        config = self.config
+        fixtures = config.stash.get(FIXTURES_KEY, None)
+        if fixtures:
+            try:
+                fixture_outputs = fixtures.deploy()
+            except Exception as e:
+                config.stash[FIXTURES_PASSED_KEY] = False
+                raise e
+        else:
+            fixture_outputs = None
+        self.result = api.run_test(
+            self.path,
+            stack_name=stack_name_from_path(self.path, config.rootpath),
+            capabilities=config.getoption("critter_capabilities"),
+            delete_stack=config.getoption("critter_delete_stack"),
+            trigger_rule_evaluation=config.getoption("critter_trigger_rule_evaluation"),
+            template_bucket=config.getoption("critter_template_bucket"),
+            latency_history=config.getoption("critter_latency_history"),
+            fixture_outputs=fixture_outputs,
+            max_api_calls=config.getoption("critter_max_api_calls"),
+            skip_preflight=config.getoption("critter_skip_preflight"),
+            rule_code=critter_rule_code(config),
+            on_deploy_failure=config.getoption("critter_on_deploy_failure"),
+            clients=config.stash.setdefault(CLIENTS_KEY, {}),
+        )
+        if not self.result.passed:
+            if fixtures:
+                config.stash[FIXTURES_PASSED_KEY] = False
+            raise CritterTestFailed(self.result)
+
+    def repr_failure(self, excinfo):
+        if not isinstance(excinfo.value, CritterTestFailed):
+            return super().repr_failure(excinfo)
+
+        result = excinfo.value.result
+        if isinstance(result.error, TestFailure):
+            lines = []
+            for rule_result in result.rule_results or [result]:
+                if rule_result.passed:
+                    continue
+                lines.append(
+                    f"Config rule '{rule_result.config_rule_name}' evaluated one or more resources with an "
+                    "unexpected compliance type"
+                )
+                for r_id in rule_result.failed_resource_ids:
+                    resource = rule_result.resources[r_id]
+                    lines.append(
+                        f"  {r_id}: expected {resource['expected_compliance_type']}, "
+                        f"actual {resource['evaluation_result'].get('ComplianceType')}"
+                    )
+            return "\n".join(lines)
+
+        error = result.error
+        return "critter encountered an error:\n" + "".join(
+            traceback.format_exception(type(error), error, error.__traceback__)
+        )
+
+    def reportinfo(self):
+        return self.path, None, f"critter test: {self.name}"
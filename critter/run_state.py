@@ -0,0 +1,62 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import datetime
+import json
+import os
+
+DATETIME_KEY = "__datetime__"
+# Parsed with strptime, datetime.fromisoformat needs Python 3.7
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+DATETIME_OFFSET_FORMAT = DATETIME_FORMAT + "%z"
+
+
+def encode_datetime(o):
+    if isinstance(o, datetime.datetime):
+        return {DATETIME_KEY: o.strftime(DATETIME_OFFSET_FORMAT if o.utcoffset() is not None else DATETIME_FORMAT)}
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def decode_datetime(d):
+    if list(d.keys()) == [DATETIME_KEY]:
+        value = d[DATETIME_KEY]
+        # UTC offsets are formatted as +HHMM
+        has_offset = len(value) > 5 and value[-5] in "+-"
+        return datetime.datetime.strptime(value, DATETIME_OFFSET_FORMAT if has_offset else DATETIME_FORMAT)
+    return d
+
+
+class RunState:
+    """Local JSON checkpoint of a critter test, saved at phase boundaries so an interrupted run can be resumed"""
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        with open(self.path) as f:
+            state = json.load(f, object_hook=decode_datetime)
+        if state.get("version") != self.VERSION:
+            raise Exception(
+                f"Error - Run state '{self.path}' was saved by an incompatible critter version, rerun the test "
+                "without resuming"
+            )
+        return state
+
+    def save(self, state):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so a run killed mid-write never leaves a truncated state behind
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.VERSION, **state}, f, default=encode_datetime, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path)
@@ -4,24 +4,83 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import base64
 import boto3
 import botocore
+import concurrent.futures
+import copy
+import datetime
+import hashlib
+import io
 import json
 import logging
 import os
+import re
+import threading
 import time
 import traceback
+import urllib.parse
+import zipfile
+from . import latency, run_state, status_poller, throttle
 from .version import __version__
 
-logging.basicConfig(format="%(message)s")
-logger = logging.getLogger("")
-logger.setLevel("WARNING")
+logger = logging.getLogger(__name__)
+# Guards lazily created boto3 clients shared between Stacks
+_clients_lock = threading.Lock()
 
 
 class TestFailure(Exception):
     pass
 
 
+class DeployFailure(Exception):
+    pass
+
+
+class EvaluationCancelled(Exception):
+    pass
+
+
+class ApiCallBudgetExceeded(Exception):
+    pass
+
+
+class PreflightFailure(Exception):
+    pass
+
+
+class TestResult:
+    """Outcome of a single critter test, returned by Stack.run()"""
+
+    __test__ = False  # Not a pytest test class
+
+    def __init__(self, stack_name, config_rule_name=None, resources=None, error=None, rule_results=None):
+        self.stack_name = stack_name
+        # Comma separated rule names for stacks testing multiple Config rules
+        self.config_rule_name = config_rule_name
+        # Resource id -> {"expected_compliance_type": ..., "evaluation_result": ..., "resource_type": ...}
+        self.resources = resources or {}
+        self.error = error
+        # One TestResult per Config rule for stacks testing multiple Config rules
+        self.rule_results = rule_results or []
+
+    @property
+    def passed(self):
+        return self.error is None
+
+    @property
+    def failed_resource_ids(self):
+        return [
+            r_id
+            for r_id, r in self.resources.items()
+            if r["evaluation_result"].get("ComplianceType") != r["expected_compliance_type"]
+        ]
+
+    def __repr__(self):
+        status = "passed" if self.passed else "failed"
+        return f"<TestResult stack_name='{self.stack_name}' config_rule_name='{self.config_rule_name}' {status}>"
+
+
 class Stack:
     OUTPUT_KEYS = {
         "CONFIG_RULE_NAME": "ConfigRuleName",
@@ -47,11 +106,75 @@ class Stack:
         OUTPUT_KEYS["NOT_APPLICABLE_RESOURCE_IDS"]: "NOT_APPLICABLE",
     }
 
-    CFN_WAITER_CONFIG = {"Delay": 15}
+    # Outputs of stacks testing multiple Config rules are prefixed per rule, i.e. 'RetentionConfigRuleName' and
+    # 'RetentionCompliantResourceIds'. Unprefixed outputs are used by the rule declared by 'ConfigRuleName'.
+    output_prefix = ""
+    # Per-rule views of the stack, set by process_outputs() when the stack tests multiple Config rules
+    config_rule_tests = None
+
     AWS_CONFIG_API_DELAY_SEC = 15
+    # Resources are usually recorded by AWS Config within a few minutes of deployment
+    RESOURCE_RECORDING_WARNING_SEC = 180
+    RESOURCE_RECORDING_TIMEOUT_SEC = 900
+    # NOT_APPLICABLE evaluations are not stored by AWS Config. They are found in the PutEvaluations events CloudTrail
+    # delivers within about 15 minutes.
+    CLOUDTRAIL_API_DELAY_SEC = 30
+    NOT_APPLICABLE_TIMEOUT_SEC = 1200
+
+    SKIP_PREFLIGHT_ARG = "--skip-preflight"
+    CONFIG_RULE_READY_STATES = ["ACTIVE", "EVALUATING"]
+    # Only recorded by an 'allSupported' recorder that also includes global resource types
+    GLOBAL_RESOURCE_TYPES = ["AWS::IAM::User", "AWS::IAM::Group", "AWS::IAM::Role", "AWS::IAM::Policy"]
+    skip_preflight = False
+    # A simple quoted or unquoted YAML output value, optionally followed by a comment
+    TEMPLATE_LITERAL_VALUE_PATTERN = re.compile(
+        r"Value:\s+(?:(?P<q>['\"])(?P<quoted>[\w.-]+)(?P=q)|(?P<plain>[\w.-]+))(?:\s+#.*)?$"
+    )
+
+    RULE_CODE_ARG = "--rule-code"
+    # Key of the Lambda function code directory used for every tested custom Lambda Config rule
+    RULE_CODE_ALL_RULES = ""
+    LAMBDA_UPDATE_DELAY_SEC = 2
+    # Config rule name -> Lambda function code directory pushed before the rule is tested
+    rule_code = {}
+    # Names of the Config rules whose code was pushed, shared with the rule tests
+    updated_config_rules = None
+    # Configuration recorder read by the pre-flight check, None if it could not be read
+    configuration_recorder = None
+    # Names of the Config rules that passed the pre-flight check, None until the recorder is checked
+    checked_config_rules = None
 
     TRIGGER_RULE_EVALUATION_ARG = "--trigger-rule-evaluation"
 
+    EVALUATION_STRATEGY_TRIGGER = "TriggerEvaluation"
+    EVALUATION_STRATEGY_WAIT_FOR_CHANGE = "WaitForChangeTriggeredEvaluation"
+    CHANGE_TRIGGER_MESSAGE_TYPES = [
+        "ConfigurationItemChangeNotification",
+        "OversizedConfigurationItemChangeNotification",
+    ]
+    PERIODIC_TRIGGER_MESSAGE_TYPES = [
+        "ScheduledNotification",
+        "ConfigurationSnapshotDeliveryCompleted",
+    ]
+    API_RATE_LIMIT_ARG = "--api-rate-limit"
+
+    # Set on the rule tests of a stack while their evaluations run in parallel, the other evaluations stop once
+    # one of them fails
+    stop_evaluation = None
+    last_stack_event_timestamp = None
+
+    TEMPLATE_BUCKET_ARG = "--template-bucket"
+    TEMPLATE_PREFIX_DEFAULT = "critter-templates/"
+    # Templates are sent inline as TemplateBody unless a template bucket is configured
+    template_bucket = None
+    template_prefix = TEMPLATE_PREFIX_DEFAULT
+
+    # JSON lines file that stores rule evaluation latency reports across runs
+    latency_history = None
+
+    # Process-wide api rate limiter shared by all Stack instances
+    limiter = throttle.limiter
+
     DELETE_STACK_ARG = "--delete-stack"
     DELETE_STACK_ALWAYS = "Always"
     DELETE_STACK_ON_SUCCESS = "OnSuccess"
@@ -67,6 +190,49 @@ class Stack:
         DELETE_STACK_NEVER,
     ]
 
+    ON_DEPLOY_FAILURE_ARG = "--on-deploy-failure"
+    ON_DEPLOY_FAILURE_DELETE = "Delete"
+    ON_DEPLOY_FAILURE_KEEP = "Keep"
+    ON_DEPLOY_FAILURE_DEFAULT = ON_DEPLOY_FAILURE_DELETE
+    ON_DEPLOY_FAILURE_CHOICES = [ON_DEPLOY_FAILURE_DELETE, ON_DEPLOY_FAILURE_KEEP]
+    on_deploy_failure = ON_DEPLOY_FAILURE_DEFAULT
+
+    FIXTURE_ARG = "--fixture"
+    FIXTURE_STACK_NAME_PREFIX = "Critter-fixture-"
+    # Outputs of the session's fixture stacks, passed to the test stack's matching template parameters
+    fixture_templates = []
+    fixture_outputs = None
+    template_parameters = {}
+
+    RESUME_ARG = "--resume"
+    RUN_STATE_DIR_DEFAULT = ".critter"
+    # Phases checkpointed to the run state file, in execution order. A resumed run skips the completed phases.
+    RUN_PHASES = [
+        "deploy",
+        "process_outputs",
+        "wait_for_config_resources",
+        "start_config_rule_evaluation",
+        "wait_for_config_evaluations",
+    ]
+    MAX_API_CALLS_ARG = "--max-api-calls"
+    # AWS api calls made by the test, shared with its rule tests. The test fails if it makes more than max_api_calls.
+    max_api_calls = None
+    api_calls = None
+    # DescribeStacks response read once after deploy and shared by the phases that need the stack id or outputs
+    stack_snapshot = None
+
+    run_state = None
+    resume = False
+    phase = None
+    stack_id = None
+    deploy_action_performed = None
+    stack_outputs = None
+    config_rule = None
+    resource_types = None
+    skip_wait_for_resource_recording = False
+    evaluation_strategy = None
+    evaluation_triggered_time = None
+
     def parse_args(self, args):
         parser = argparse.ArgumentParser(description=f"critter {__version__} - AWS Config Rule Integration TesTER")
 
@@ -88,8 +254,9 @@ class Stack:
         parser.add_argument(
             self.TRIGGER_RULE_EVALUATION_ARG,
             help=(
-                "Trigger Config rule evaluation after CloudFormation stack deployment. Useful for "
-                "periodic evaluation rules. Also ensures the rule evaluation occured after stack deployment."
+                "Always trigger Config rule evaluation after CloudFormation stack deployment. By default critter "
+                "triggers evaluation only for periodic rules and for stacks that were not newly created. Also ensures "
+                "the rule evaluation occured after stack deployment."
             ),
             dest="trigger_rule_evaluation",
             action="store_true",
@@ -129,57 +296,343 @@ class Stack:
             default=self.DELETE_STACK_DEFAULT,
             choices=self.DELETE_STACK_CHOICES,
         )
+
+        parser.add_argument(
+            self.ON_DEPLOY_FAILURE_ARG,
+            help=(
+                "What happens to a newly created CloudFormation stack when a resource fails to deploy. critter "
+                "reports the first failed resource immediately either way. 'Keep' leaves the stack for debugging "
+                f"(default: {self.ON_DEPLOY_FAILURE_DEFAULT})"
+            ),
+            default=self.ON_DEPLOY_FAILURE_DEFAULT,
+            choices=self.ON_DEPLOY_FAILURE_CHOICES,
+        )
+
+        parser.add_argument(
+            self.TEMPLATE_BUCKET_ARG,
+            metavar="BUCKET",
+            help=(
+                "Upload the template to this S3 bucket under a content hash key and deploy it with TemplateURL. "
+                "Required for templates larger than the CloudFormation TemplateBody limit."
+            ),
+        )
+
+        parser.add_argument(
+            "--template-prefix",
+            metavar="PREFIX",
+            default=self.TEMPLATE_PREFIX_DEFAULT,
+            help=f"S3 key prefix for uploaded templates (default: {self.TEMPLATE_PREFIX_DEFAULT})",
+        )
+
+        parser.add_argument(
+            "--latency-history",
+            metavar="FILE",
+            help=(
+                "Append Config rule evaluation latency percentiles to this JSON lines file and warn when a rule "
+                "is much slower than in previous runs"
+            ),
+        )
+
+        parser.add_argument(
+            self.API_RATE_LIMIT_ARG,
+            default=[],
+            metavar="OPERATION=TPS",
+            nargs="+",
+            help=(
+                "Maximum calls per second for an AWS api operation, shared by all tests in the process "
+                "(i.e. config.StartConfigRulesEvaluation=0.5 cloudformation.DescribeStacks=1)"
+            ),
+        )
+
+        parser.add_argument(
+            "--max-throttle-retries",
+            type=int,
+            default=throttle.RateLimiter.DEFAULT_MAX_RETRIES,
+            help=(
+                "Number of retries for a throttled AWS api call before critter fails "
+                f"(default: {throttle.RateLimiter.DEFAULT_MAX_RETRIES})"
+            ),
+        )
+
+        parser.add_argument(
+            self.RULE_CODE_ARG,
+            default=[],
+            metavar="[RULE_NAME=]DIR",
+            nargs="+",
+            help=(
+                "Push the Lambda function code in DIR to the custom Config rule(s) before testing them and "
+                "re-trigger their evaluation. Unchanged code is skipped by code hash. Without RULE_NAME, DIR is used "
+                "for every tested custom Lambda rule."
+            ),
+        )
+
+        parser.add_argument(
+            self.SKIP_PREFLIGHT_ARG,
+            action="store_true",
+            help=(
+                "Skip checking the AWS Config recorder and the Config rule state and last evaluation errors "
+                "before deploying the stack"
+            ),
+        )
+
+        parser.add_argument(
+            self.MAX_API_CALLS_ARG,
+            type=int,
+            metavar="COUNT",
+            help=(
+                "Fail the test if it makes more AWS api calls than COUNT. Catches api call regressions in CI. "
+                "Retries of throttled calls and the stack status polling shared between tests are not counted."
+            ),
+        )
+
+        parser.add_argument(
+            self.FIXTURE_ARG,
+            default=[],
+            metavar="TEMPLATE",
+            nargs="+",
+            help=(
+                "CloudFormation template(s) of shared dependencies deployed once before the test. Their outputs are "
+                "passed to the test stack parameters with the same names. Deleted after the test following "
+                f"'{self.DELETE_STACK_ARG}'."
+            ),
+        )
+
+        parser.add_argument(
+            self.RESUME_ARG,
+            action="store_true",
+            help=(
+                "Continue an interrupted test from its run state file without redeploying the stack or "
+                "re-triggering Config rule evaluation"
+            ),
+        )
+
+        parser.add_argument(
+            "--run-state",
+            metavar="FILE",
+            help=(
+                "File the test progress is checkpointed to after each phase "
+                f"(default: {self.RUN_STATE_DIR_DEFAULT}/STACK-NAME.json)"
+            ),
+        )
         parsed_args = parser.parse_args(args)
 
-        logger.setLevel(parsed_args.log_level.upper())
+        # Set the root logger level so 'debug' includes boto3 debug logs
+        logging.getLogger().setLevel(parsed_args.log_level.upper())
 
-        self.template_file = parsed_args.template
+        api_rate_limits = {}
+        for rate_limit in parsed_args.api_rate_limit:
+            operation, _, rate = rate_limit.partition("=")
+            try:
+                api_rate_limits[operation.strip()] = float(rate)
+            except ValueError:
+                raise Exception(
+                    f"Error - {self.API_RATE_LIMIT_ARG} must be formatted as OPERATION=TPS, received '{rate_limit}'"
+                )
+        self.limiter.configure(rates=api_rate_limits, max_retries=parsed_args.max_throttle_retries)
+
+        rule_code = {}
+        for code in parsed_args.rule_code:
+            config_rule_name, _, code_dir = code.rpartition("=")
+            rule_code[config_rule_name.strip()] = code_dir
+
+        self.configure(
+            parsed_args.template,
+            stack_name=parsed_args.stack_name,
+            stack_tags=parsed_args.stack_tags,
+            capabilities=parsed_args.capabilities,
+            delete_stack=parsed_args.delete_stack,
+            trigger_rule_evaluation=parsed_args.trigger_rule_evaluation,
+            template_bucket=parsed_args.template_bucket,
+            template_prefix=parsed_args.template_prefix,
+            latency_history=parsed_args.latency_history,
+            on_deploy_failure=parsed_args.on_deploy_failure,
+            run_state_file=parsed_args.run_state,
+            resume=parsed_args.resume,
+            fixture_templates=parsed_args.fixture,
+            max_api_calls=parsed_args.max_api_calls,
+            skip_preflight=parsed_args.skip_preflight,
+            rule_code=rule_code,
+        )
+
+    def configure(
+        self,
+        template_file,
+        stack_name=None,
+        stack_tags=None,
+        capabilities=None,
+        delete_stack=DELETE_STACK_DEFAULT,
+        trigger_rule_evaluation=False,
+        template_bucket=None,
+        template_prefix=TEMPLATE_PREFIX_DEFAULT,
+        latency_history=None,
+        on_deploy_failure=ON_DEPLOY_FAILURE_DEFAULT,
+        run_state_file=None,
+        resume=False,
+        fixture_templates=None,
+        fixture_outputs=None,
+        max_api_calls=None,
+        skip_preflight=False,
+        rule_code=None,
+    ):
+        """Configure the test without parsing command line arguments. Used by parse_args and the Python api."""
+
+        self.template_file = str(template_file)
         template_filename = os.path.splitext(os.path.basename(self.template_file))[0]
         with open(self.template_file) as f:
             self.template_body = f.read()
 
-        if parsed_args.stack_name:
-            self.stack_name = parsed_args.stack_name
+        if stack_name:
+            self.stack_name = stack_name
         else:
             self.stack_name = "Critter-" + template_filename.replace("_", "-")
 
-        if parsed_args.delete_stack not in self.DELETE_STACK_CHOICES:
+        if delete_stack not in self.DELETE_STACK_CHOICES:
             raise Exception(
-                f"Error - delete_stack must be one of {self.DELETE_STACK_CHOICES}, "
-                f"received '{parsed_args.delete_stack}'"
+                f"Error - delete_stack must be one of {self.DELETE_STACK_CHOICES}, received '{delete_stack}'"
             )
-        self.delete_stack = parsed_args.delete_stack
+        self.delete_stack = delete_stack
 
-        if parsed_args.stack_tags:
-            self.stack_tags = parsed_args.stack_tags
+        if on_deploy_failure not in self.ON_DEPLOY_FAILURE_CHOICES:
+            raise Exception(
+                f"Error - on_deploy_failure must be one of {self.ON_DEPLOY_FAILURE_CHOICES}, "
+                f"received '{on_deploy_failure}'"
+            )
+        self.on_deploy_failure = on_deploy_failure
+
+        if stack_tags:
+            self.stack_tags = stack_tags
         else:
             self.stack_tags = [
                 {"Key": "ConfigRuleTesting", "Value": "True"},
                 {"Key": "Critter", "Value": "True"},
             ]
 
-        self.cfn_capabilities = parsed_args.capabilities
-        # TODO: default trigger_rule_evaluation to True if rule detected as periodic evaluation only
-        #       or if stack already exists
-        self.trigger_rule_evaluation = parsed_args.trigger_rule_evaluation
+        self.cfn_capabilities = capabilities or []
+        self.trigger_rule_evaluation = trigger_rule_evaluation
+        self.template_bucket = template_bucket
+        self.template_prefix = template_prefix
+        self.latency_history = latency_history
+
+        self.run_state = run_state.RunState(
+            run_state_file or os.path.join(self.RUN_STATE_DIR_DEFAULT, f"{self.stack_name}.json")
+        )
+        self.fixture_templates = [str(t) for t in fixture_templates or []]
+        self.fixture_outputs = fixture_outputs
+        self.max_api_calls = max_api_calls
+        self.skip_preflight = skip_preflight
+        self.rule_code = rule_code or {}
+        for code_dir in self.rule_code.values():
+            if not os.path.exists(code_dir):
+                raise Exception(f"Error - {self.RULE_CODE_ARG} Lambda function code '{code_dir}' not found")
+        self.resume = resume
+        if resume and not self.run_state.exists():
+            raise Exception(
+                f"Error - Cannot resume, run state file '{self.run_state.path}' not found. Run the test without "
+                f"'{self.RESUME_ARG}'."
+            )
+
+    def initialize_boto_clients(self, clients=None):
+        """Create boto3 clients. Pass the same clients dict to several Stacks to share clients between them."""
 
-    def initialize_boto_clients(self):
-        self.sts = boto3.client("sts")
-        self.cfn = boto3.client("cloudformation")
-        self.config = boto3.client("config")
+        clients = {} if clients is None else clients
+        for service in ["sts", "cloudformation", "config"]:
+            if service not in clients:
+                clients[service] = self.limiter.register(boto3.client(service))
+        self.clients = clients
+        self.sts = clients["sts"]
+        self.cfn = clients["cloudformation"]
+        self.config = clients["config"]
+
+    def get_client(self, service):
+        """Return the shared client of a service only some tests use, creating it on first use"""
+
+        # Rule evaluations are waited on in parallel threads, and creating boto3 clients is not thread safe
+        with _clients_lock:
+            if service not in self.clients:
+                self.clients[service] = self.limiter.register(boto3.client(service))
+            return self.clients[service]
 
     def test(self):
         """The main entrypoint into executing a critter test. This function is called from /bin/critter"""
 
-        logger.info(f"Testing using identity '{self.sts.get_caller_identity()['Arn']}'")
+        fixtures = None
+        if self.fixture_templates:
+            fixtures = FixtureStacks(
+                self.fixture_templates,
+                clients=self.clients,
+                stack_tags=self.stack_tags,
+                capabilities=self.cfn_capabilities,
+                delete_stack=self.delete_stack,
+                template_bucket=self.template_bucket,
+                template_prefix=self.template_prefix,
+                on_deploy_failure=self.on_deploy_failure,
+            )
+        passed = False
+        try:
+            if fixtures:
+                self.fixture_outputs = fixtures.deploy()
+            passed = self.run().passed
+        except KeyboardInterrupt:
+            exit(1)
+        except (throttle.ThrottlingError, DeployFailure) as e:
+            logger.error(f"\nCritter encountered an error deploying the fixture stacks:\n\n{e}\n")
+        finally:
+            if fixtures:
+                fixtures.teardown(passed)
+        if not passed:
+            exit(1)
+
+    def run(self):
+        """Execute the critter test and return a TestResult. KeyboardInterrupt is re-raised after stack cleanup."""
+
+        self.config_rule_name = None
+        self.resources = {}
+        self.config_rule_tests = None
+        self.rule_results = []
+        self.phase = None
+        self.stack_snapshot = None
+        self.configuration_recorder = None
+        self.checked_config_rules = None
+        self.updated_config_rules = set()
+        self.api_calls = throttle.ApiCallCounter()
+        identity = self.api_call("sts.GetCallerIdentity", self.sts.get_caller_identity)
+        logger.info(f"Testing using identity '{identity['Arn']}'")
         err = None
+        # Nothing is cleaned up if the test fails before the stack is deployed, the stack may be someone else's
+        deploy_started = False
         try:
-            self.deploy()
-            self.process_outputs()
-            self.wait_for_config_resources()
-            self.start_config_rule_evaluation()
-            self.wait_for_config_evaluation()
-            self.validate_config_evaluation()
+            if self.resume:
+                deploy_started = True
+                self.restore_run_state()
+            else:
+                if not self.skip_preflight or self.rule_code:
+                    # Config rules named by literal template outputs are known before the stack is deployed
+                    rule_tests = self.template_config_rule_tests()
+                    if not self.skip_preflight:
+                        self.preflight_check(rule_tests)
+                    self.update_rule_code(rule_tests)
+                deploy_started = True
+                self.deploy()
+                self.checkpoint("deploy")
+            if not self.phase_completed("process_outputs"):
+                self.process_outputs()
+                for rule_test in self.get_config_rule_tests():
+                    rule_test.plan_config_rule_evaluation()
+                self.checkpoint("process_outputs")
+            if not self.phase_completed("wait_for_config_resources"):
+                if not self.skip_preflight:
+                    self.check_config_rules(self.get_config_rule_tests())
+                self.update_rule_code(self.get_config_rule_tests())
+                self.wait_for_config_resources()
+                self.checkpoint("wait_for_config_resources")
+            self.wait_for_config_evaluations()
+            self.checkpoint("wait_for_config_evaluations")
+            try:
+                self.validate_config_evaluations()
+            finally:
+                # Latency is reported for failed tests too, it never fails the test itself
+                self.report_latency()
+            self.check_api_call_budget()
         except TestFailure as e:
             logger.error(
                 f"\u274c Config rule '{self.config_rule_name}' test failed! One or more resources "
@@ -188,7 +641,16 @@ class Stack:
             logger.error(e)
             print()  # printing a blank line for console output readability
             err = e
-        except (Exception, KeyboardInterrupt) as e:
+        except ApiCallBudgetExceeded as e:
+            logger.error(f"\u274c Config rule '{self.config_rule_name}' test failed! {e}\n")
+            err = e
+        except (throttle.ThrottlingError, DeployFailure, PreflightFailure) as e:
+            logger.error(f"\nCritter encountered an error:\n\n{e}\n")
+            err = e
+        except KeyboardInterrupt as e:
+            logger.error("\nCritter was interrupted\n")
+            err = e
+        except Exception as e:
             logger.error("\nCritter encountered an error:\n")
             logger.error(traceback.format_exc())
             err = e
@@ -199,34 +661,65 @@ class Stack:
                 f"Not deleting CloudFormation stack '{self.stack_name}', specify '{self.DELETE_STACK_ARG}' "
                 "to control this behavior"
             )
-            if err:
+            if not deploy_started:
+                logger.info(f"CloudFormation stack '{self.stack_name}' was not deployed")
+            elif err:
                 if self.delete_stack == self.DELETE_STACK_ALWAYS:
                     self.delete()
+                    self.remove_run_state()
                 else:
                     logger.info(no_delete_msg)
-                exit(1)
-
-            if self.delete_stack != self.DELETE_STACK_NEVER:
+                    # Only a kept stack can be resumed
+                    if not isinstance(err, (TestFailure, ApiCallBudgetExceeded)):
+                        self.save_interrupted_run_state()
+            elif self.delete_stack != self.DELETE_STACK_NEVER:
                 self.delete()
             else:
                 logger.info(no_delete_msg)
+            # A finished test has nothing left to resume
+            if not err or isinstance(err, (TestFailure, ApiCallBudgetExceeded)):
+                self.remove_run_state()
+
+        # Clean up according to the delete policy above, then let the caller stop
+        if isinstance(err, KeyboardInterrupt):
+            raise err
+
+        return TestResult(
+            self.stack_name,
+            config_rule_name=self.config_rule_name,
+            resources=self.resources,
+            error=err,
+            rule_results=self.rule_results,
+        )
 
     def deploy(self):
         logger.info(f"Deploying CloudFormation template '{self.template_file}' as stack '{self.stack_name}'")
         self.deploy_action_performed = None
+        self.template_location = self.get_template_location()
+        self.template_parameters = self.get_template_parameters()
+        self.last_stack_event_id = None
+        self.last_stack_event_timestamp = None
         try:
-            self.cfn.create_stack(
+            self.api_call(
+                "cloudformation.CreateStack",
+                self.cfn.create_stack,
                 StackName=self.stack_name,
-                TemplateBody=self.template_body,
-                OnFailure="DELETE",
+                **self.template_location,
+                **self.template_parameters,
+                OnFailure="DELETE" if self.on_deploy_failure == self.ON_DEPLOY_FAILURE_DELETE else "DO_NOTHING",
                 Capabilities=self.cfn_capabilities,
                 Tags=self.stack_tags,
             )
 
             logger.info(f"Waiting for CloudFormation stack '{self.stack_name}' creation to complete")
-            self.cfn.get_waiter("stack_create_complete").wait(
-                StackName=self.stack_name, WaiterConfig=self.CFN_WAITER_CONFIG
-            )
+            if self.on_deploy_failure == self.ON_DEPLOY_FAILURE_DELETE:
+                failure_note = (
+                    "CloudFormation is deleting the stack. Specify "
+                    f"'{self.ON_DEPLOY_FAILURE_ARG} {self.ON_DEPLOY_FAILURE_KEEP}' to keep it for debugging."
+                )
+            else:
+                failure_note = "The stack is kept for debugging."
+            self.tail_stack_events("CREATE_COMPLETE", failure_note)
             self.deploy_action_performed = "CREATE"
         except botocore.exceptions.ClientError as e:
             if e.response["Error"]["Code"] == "AlreadyExistsException":
@@ -237,32 +730,35 @@ class Stack:
             else:
                 raise e
 
-        self.stack = boto3.resource("cloudformation").Stack(self.stack_name)
-        logger.info(f"Deployed CloudFormation stack '{self.stack.stack_id}'")
+        self.stack_id = self.describe_stack()["StackId"]
+        logger.info(f"Deployed CloudFormation stack '{self.stack_id}'")
 
     def update(self):
         logger.warning(
             f"Warning - Updating existing CloudFormation stack '{self.stack_name}'. Testing using existing stacks may "
             "result in unreliable test results. It is recommended to deploy a new stack for each test iteration."
         )
-        if not self.trigger_rule_evaluation:
-            logger.warning(
-                "Warning - Updating an existing CloudFormation stack without specifying "
-                f"'{self.TRIGGER_RULE_EVALUATION_ARG}' may result in the Config rule evaluation never occurring."
-            )
+        # Only events newer than the current most recent event belong to this update
+        stack_events = self.api_call(
+            "cloudformation.DescribeStackEvents", self.cfn.describe_stack_events, StackName=self.stack_name
+        )["StackEvents"]
+        if stack_events:
+            self.last_stack_event_id = stack_events[0]["EventId"]
+            self.last_stack_event_timestamp = stack_events[0].get("Timestamp")
         try:
-            self.cfn.update_stack(
+            self.api_call(
+                "cloudformation.UpdateStack",
+                self.cfn.update_stack,
                 StackName=self.stack_name,
-                TemplateBody=self.template_body,
+                **self.template_location,
+                **self.template_parameters,
                 DisableRollback=True,
                 Capabilities=self.cfn_capabilities,
                 Tags=self.stack_tags,
             )
 
             logger.info(f"Waiting for CloudFormation stack '{self.stack_name}' update to complete")
-            self.cfn.get_waiter("stack_update_complete").wait(
-                StackName=self.stack_name, WaiterConfig=self.CFN_WAITER_CONFIG
-            )
+            self.tail_stack_events("UPDATE_COMPLETE", "The stack is kept in its failed state for debugging.")
             self.deploy_action_performed = "UPDATE"
         except botocore.exceptions.ClientError as e:
             if "No updates are to be performed" in e.response["Error"]["Message"]:
@@ -273,11 +769,131 @@ class Stack:
             else:
                 raise e
 
+    def new_stack_events(self):
+        """Return the stack events newer than the last seen event, oldest first.
+
+        DescribeStackEvents returns the newest events first, so pages are only read until the last seen event.
+        """
+
+        events = []
+        kwargs = {"StackName": self.stack_name}
+        while True:
+            page = self.api_call("cloudformation.DescribeStackEvents", self.cfn.describe_stack_events, **kwargs)
+            for event in page["StackEvents"]:
+                if event["EventId"] == self.last_stack_event_id:
+                    break
+                events.append(event)
+            else:
+                if "NextToken" in page:
+                    kwargs["NextToken"] = page["NextToken"]
+                    continue
+            break
+
+        if events:
+            self.last_stack_event_id = events[0]["EventId"]
+            self.last_stack_event_timestamp = events[0].get("Timestamp")
+        return list(reversed(events))
+
+    def tail_stack_events(self, complete_status, failure_note=""):
+        """Log stack events until the stack reaches complete_status. Fails on the first *_FAILED event.
+
+        The stack status is watched by the shared stack status poller. Stack events are only read when the status
+        changes, so a deploying stack makes no api calls of its own while its status stays the same.
+        """
+
+        stack_status = None
+        while True:
+            stack_status = self.status_poller().wait(
+                self.stack_name, lambda status, previous=stack_status: status != previous
+            )
+
+            # The events of a deleted stack can not be read by stack name
+            stack_events = self.new_stack_events() if stack_status != "DELETE_COMPLETE" else []
+            for event in stack_events:
+                status = event["ResourceStatus"]
+                reason = event.get("ResourceStatusReason", "")
+                logger.info(f"{status:<32} {event['ResourceType']:<40} {event['LogicalResourceId']} {reason}".rstrip())
+
+                is_stack_event = (
+                    event["ResourceType"] == "AWS::CloudFormation::Stack"
+                    and event["LogicalResourceId"] == self.stack_name
+                )
+                if status.endswith("_FAILED") or (is_stack_event and "ROLLBACK" in status):
+                    raise DeployFailure(
+                        f"Error - CloudFormation stack '{self.stack_name}' deployment failed. Resource "
+                        f"'{event['LogicalResourceId']}' ({event['ResourceType']}) {status}: {reason}\n{failure_note}"
+                    )
+                if is_stack_event and status == complete_status:
+                    return
+
+            if stack_status == complete_status:
+                # The final stack event was not seen, it is read again before waiting for evaluations
+                self.last_stack_event_timestamp = None
+                return
+            if not stack_status.endswith("_IN_PROGRESS"):
+                raise DeployFailure(
+                    f"Error - CloudFormation stack '{self.stack_name}' deployment failed with stack status "
+                    f"{stack_status}\n{failure_note}"
+                )
+
+    def get_template_location(self):
+        """Return the TemplateBody or TemplateURL keyword argument for create_stack and update_stack"""
+
+        if not self.template_bucket:
+            return {"TemplateBody": self.template_body}
+        return {"TemplateURL": self.upload_template()}
+
+    def get_template_parameters(self):
+        """Return the Parameters keyword argument for create_stack and update_stack, filled from fixture outputs"""
+
+        if not self.fixture_outputs:
+            return {}
+        summary = self.api_call(
+            "cloudformation.GetTemplateSummary", self.cfn.get_template_summary, **self.template_location
+        )
+        parameters = [
+            {"ParameterKey": p["ParameterKey"], "ParameterValue": self.fixture_outputs[p["ParameterKey"]]}
+            for p in summary.get("Parameters", [])
+            if p["ParameterKey"] in self.fixture_outputs
+        ]
+        if not parameters:
+            return {}
+        logger.info(f"Passing fixture stack outputs as parameters {[p['ParameterKey'] for p in parameters]}")
+        return {"Parameters": parameters}
+
+    def upload_template(self):
+        """Upload the template to the template bucket under a content hash key, reusing the object if it exists"""
+
+        s3 = self.get_client("s3")
+
+        template = self.template_body.encode("utf-8")
+        extension = os.path.splitext(self.template_file)[1] or ".template"
+        key = f"{self.template_prefix}{hashlib.sha256(template).hexdigest()}{extension}"
+        try:
+            self.api_call("s3.HeadObject", s3.head_object, Bucket=self.template_bucket, Key=key)
+            logger.info(f"Reusing template 's3://{self.template_bucket}/{key}'")
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] not in ["404", "NoSuchKey", "NotFound"]:
+                raise e
+            self.api_call("s3.PutObject", s3.put_object, Bucket=self.template_bucket, Key=key, Body=template)
+            logger.info(f"Uploaded template '{self.template_file}' to 's3://{self.template_bucket}/{key}'")
+
+        return self.template_url(s3, key)
+
+    def template_url(self, s3, key):
+        """Virtual-hosted-style URL of the template object in the bucket's own region"""
+
+        location = self.api_call("s3.GetBucketLocation", s3.get_bucket_location, Bucket=self.template_bucket)
+        # Buckets in us-east-1 have no location constraint, 'EU' is the legacy name of eu-west-1
+        region = {None: "us-east-1", "": "us-east-1", "EU": "eu-west-1"}.get(
+            location.get("LocationConstraint"), location.get("LocationConstraint")
+        )
+        domain = "amazonaws.com.cn" if region.startswith("cn-") else "amazonaws.com"
+        return f"https://{self.template_bucket}.s3.{region}.{domain}/{urllib.parse.quote(key)}"
+
     def process_outputs(self):
         # Save stack outputs in an easy access dict
-        self.stack_outputs = self.OUTPUTS_DEFAULTS.copy()
-        for o in self.stack.outputs:
-            self.stack_outputs[o["OutputKey"]] = o["OutputValue"]
+        self.stack_outputs = {**self.OUTPUTS_DEFAULTS, **self.get_stack_outputs()}
 
         # Sleep for DelayAfterDeploy immediately after loading stack outputs
         self.delay_after_deploy = int(self.stack_outputs[self.OUTPUT_KEYS["DELAY_AFTER_DEPLOY"]])
@@ -285,32 +901,76 @@ class Stack:
             logger.info(f"Sleeping {self.delay_after_deploy} seconds")
             time.sleep(self.delay_after_deploy)
 
-        self.config_rule_name = self.stack_outputs[self.OUTPUT_KEYS["CONFIG_RULE_NAME"]].strip()
+        output_prefixes = self.config_rule_output_prefixes()
+        if output_prefixes == [""]:
+            self.process_config_rule_outputs()
+            return
+
+        self.config_rule_tests = []
+        for output_prefix in output_prefixes:
+            # Each rule test shares the deployed stack, clients and outputs with this Stack
+            rule_test = copy.copy(self)
+            rule_test.output_prefix = output_prefix
+            rule_test.config_rule_tests = None
+            rule_test.process_config_rule_outputs()
+            self.config_rule_tests.append(rule_test)
+        self.config_rule_name = ", ".join([t.config_rule_name for t in self.config_rule_tests])
+        logger.info(f"Testing {len(self.config_rule_tests)} Config rules: {self.config_rule_name}")
+
+    def describe_stack(self):
+        """Read the stack id, status and outputs with a single DescribeStacks call, kept as the stack snapshot"""
+
+        self.stack_snapshot = self.api_call(
+            "cloudformation.DescribeStacks", self.cfn.describe_stacks, StackName=self.stack_name
+        )["Stacks"][0]
+        return self.stack_snapshot
+
+    def get_stack_outputs(self):
+        snapshot = self.stack_snapshot or self.describe_stack()
+        return {o["OutputKey"]: o["OutputValue"] for o in snapshot.get("Outputs", [])}
+
+    def config_rule_output_prefixes(self, outputs=None):
+        config_rule_name_key = self.OUTPUT_KEYS["CONFIG_RULE_NAME"]
+        output_prefixes = [
+            k[: -len(config_rule_name_key)]
+            for k, v in (self.stack_outputs if outputs is None else outputs).items()
+            if k.endswith(config_rule_name_key) and v.strip()
+        ]
+        return sorted(output_prefixes) or [""]
+
+    def get_config_rule_tests(self):
+        """Per-rule views of the stack. A stack testing a single Config rule tests it on the Stack itself."""
+        return self.config_rule_tests or [self]
+
+    def config_rule_output(self, key, inherit=False):
+        """Load a per-rule stack output. With inherit, fall back to the unprefixed output shared by all rules."""
+
+        output_key = self.OUTPUT_KEYS[key]
+        if self.output_prefix + output_key in self.stack_outputs:
+            return self.stack_outputs[self.output_prefix + output_key]
+        if inherit:
+            return self.stack_outputs[output_key]
+        return self.OUTPUTS_DEFAULTS[output_key]
+
+    def process_config_rule_outputs(self):
+        self.config_rule_name = self.config_rule_output("CONFIG_RULE_NAME").strip()
         if self.config_rule_name == self.OUTPUTS_DEFAULTS[self.OUTPUT_KEYS["CONFIG_RULE_NAME"]]:
             raise Exception(
-                f"Error - Missing required output '{self.OUTPUT_KEYS['CONFIG_RULE_NAME']}' "
+                f"Error - Missing required output '{self.output_prefix}{self.OUTPUT_KEYS['CONFIG_RULE_NAME']}' "
                 f"on CloudFormation stack '{self.stack_name}'"
             )
 
-        try:
-            self.config_rule = self.config.describe_config_rules(ConfigRuleNames=[self.config_rule_name])[
-                "ConfigRules"
-            ][0]
-        except botocore.exceptions.ClientError as e:
-            if e.response["Error"]["Code"] == "NoSuchConfigRuleException":
-                raise Exception(f"Error - Config rule '{self.config_rule_name}' not found!")
-            else:
-                raise e
+        self.load_config_rule()
 
         self.resources = {}
-        resource_ids_output_keys = self.EXPECTED_COMPLIANCE_TYPE_LOOKUP.keys()
-        for output_key in resource_ids_output_keys:
-            resource_ids_csv = self.stack_outputs[output_key]
+        resource_ids_keys = ["COMPLIANT_RESOURCE_IDS", "NON_COMPLIANT_RESOURCE_IDS", "NOT_APPLICABLE_RESOURCE_IDS"]
+        for key in resource_ids_keys:
+            resource_ids_csv = self.config_rule_output(key)
             if not resource_ids_csv:
                 # Empty string means cfn stack did not declare the output
                 continue
             for r_id in [i.strip() for i in resource_ids_csv.split(",")]:
-                expected_compliance_type = self.EXPECTED_COMPLIANCE_TYPE_LOOKUP[output_key]
+                expected_compliance_type = self.EXPECTED_COMPLIANCE_TYPE_LOOKUP[self.OUTPUT_KEYS[key]]
                 if expected_compliance_type == "NOT_APPLICABLE":
                     logger.warning(
                         "Warning - Testing for NOT_APPLICABLE compliance type is experimental and "
@@ -326,102 +986,459 @@ class Stack:
         if not self.resources:
             raise Exception(
                 "Error - Did not find any resource ids outputs. Specify one or more of the following "
-                f"CloudFormation stack outputs: {list(resource_ids_output_keys)}"
+                f"CloudFormation stack outputs: {[self.output_prefix + self.OUTPUT_KEYS[k] for k in resource_ids_keys]}"
             )
 
+    def load_config_rule(self):
+        """Describe the Config rule named by the outputs and load its resource types"""
+
+        try:
+            self.config_rule = self.api_call(
+                "config.DescribeConfigRules", self.config.describe_config_rules, ConfigRuleNames=[self.config_rule_name]
+            )["ConfigRules"][0]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchConfigRuleException":
+                raise Exception(f"Error - Config rule '{self.config_rule_name}' not found!")
+            else:
+                raise e
+
         # TODO: load resource types from test stack output if not provided in rule scope attribute
-        self.resource_types = self.config_rule["Scope"]["ComplianceResourceTypes"]
+        # Periodic rules may not have a scope
+        self.resource_types = (self.config_rule.get("Scope") or {}).get("ComplianceResourceTypes", [])
 
         self.skip_wait_for_resource_recording = (
-            self.stack_outputs[self.OUTPUT_KEYS["SKIP_WAIT_FOR_RESOURCE_RECORDING"]].lower() == "true"
+            self.config_rule_output("SKIP_WAIT_FOR_RESOURCE_RECORDING", inherit=True).lower() == "true"
         )
 
-    def wait_for_config_resources(self):
-        skip_msg = "Skipping waiting for resources to be recorded by AWS Config"
-        if self.skip_wait_for_resource_recording:
-            logger.info(skip_msg)
-            return
-        if not self.resource_types:
+    def template_literal_outputs(self):
+        """Outputs the template declares with a literal string value, read without deploying the template.
+
+        Outputs built with intrinsic functions are left out. YAML templates are scanned line by line because
+        critter has no YAML dependency.
+        """
+
+        try:
+            template = json.loads(self.template_body)
+        except ValueError:
+            template = None
+        if isinstance(template, dict):
+            return {
+                key: output["Value"]
+                for key, output in (template.get("Outputs") or {}).items()
+                if isinstance(output, dict) and isinstance(output.get("Value"), str)
+            }
+
+        outputs = {}
+        in_outputs = False
+        output_indent = None
+        output_key = None
+        for line in self.template_body.splitlines():
+            text = line.strip()
+            if not text or text.startswith("#"):
+                continue
+            indent = len(line) - len(line.lstrip())
+            if indent == 0:
+                in_outputs = re.match(r"Outputs:\s*(#.*)?$", text) is not None
+                output_indent = None
+                continue
+            if not in_outputs:
+                continue
+            if output_indent is None:
+                output_indent = indent
+            key = text.partition(":")[0]
+            if indent == output_indent:
+                output_key = key
+            elif key == "Value" and output_key and indent > output_indent:
+                # Values the scanner is not sure about are unknown until the stack outputs are read
+                match = self.TEMPLATE_LITERAL_VALUE_PATTERN.match(text)
+                if match:
+                    outputs[output_key] = match.group("quoted") or match.group("plain")
+        return outputs
+
+    def template_config_rule_tests(self):
+        """Rule tests of the Config rules named by literal template outputs, known without deploying the stack"""
+
+        rule_tests = []
+        outputs = {**self.OUTPUTS_DEFAULTS, **self.template_literal_outputs()}
+        for output_prefix in self.config_rule_output_prefixes(outputs):
+            rule_test = copy.copy(self)
+            rule_test.stack_outputs = outputs
+            rule_test.output_prefix = output_prefix
+            rule_test.config_rule_name = rule_test.config_rule_output("CONFIG_RULE_NAME").strip()
+            if not rule_test.config_rule_name:
+                continue
+            rule_test.load_config_rule()
+            rule_tests.append(rule_test)
+        return rule_tests
+
+    def preflight_check(self, rule_tests):
+        """Fail in seconds, before the stack is deployed, if AWS Config cannot evaluate the test resources.
+
+        rule_tests are the Config rules named by literal template outputs. Rules named by outputs built with
+        intrinsic functions are checked by check_config_rules() once the stack outputs are known.
+        """
+
+        logger.info("Checking the AWS Config configuration recorder and Config rules")
+        self.configuration_recorder = self.check_configuration_recorder()
+        self.checked_config_rules = set()
+        self.check_config_rules(rule_tests)
+
+    def check_config_rules(self, rule_tests):
+        """Check every Config rule not checked yet. A resumed run checks the configuration recorder first."""
+
+        if self.checked_config_rules is None:
+            self.configuration_recorder = self.check_configuration_recorder()
+            self.checked_config_rules = set()
+        for rule_test in rule_tests:
+            if rule_test.config_rule_name in self.checked_config_rules:
+                continue
+            rule_test.check_config_rule(self.configuration_recorder)
+            self.checked_config_rules.add(rule_test.config_rule_name)
+
+    def check_configuration_recorder(self):
+        """Return the configuration recorder, failing if it is missing or stopped"""
+
+        try:
+            recorders = self.api_call(
+                "config.DescribeConfigurationRecorders", self.config.describe_configuration_recorders
+            )["ConfigurationRecorders"]
+            statuses = self.api_call(
+                "config.DescribeConfigurationRecorderStatus", self.config.describe_configuration_recorder_status
+            )["ConfigurationRecordersStatus"]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] not in ["AccessDenied", "AccessDeniedException"]:
+                raise e
+            logger.warning(f"Warning - Unable to check the AWS Config configuration recorder: {e}")
+            return None
+
+        if not recorders:
+            raise PreflightFailure(
+                "Error - AWS Config has no configuration recorder in this account and Region, test resources will "
+                "never be recorded or evaluated. Set up AWS Config before running critter."
+            )
+        recorder = recorders[0]
+        status = next((s for s in statuses if s.get("name") == recorder["name"]), {})
+        if not status.get("recording"):
+            raise PreflightFailure(
+                f"Error - AWS Config configuration recorder '{recorder['name']}' is stopped, test resources will "
+                "never be recorded. Start it with 'aws configservice start-configuration-recorder "
+                f"--configuration-recorder-name {recorder['name']}'."
+            )
+        if status.get("lastStatus") == "Failure":
             logger.warning(
-                f"Warning - {skip_msg}. Config rule '{self.config_rule_name}' scope does not specify "
-                "applicable resource types."
+                f"Warning - AWS Config configuration recorder '{recorder['name']}' last recording failed: "
+                f"{status.get('lastErrorCode')} {status.get('lastErrorMessage', '')}".rstrip()
             )
+        return recorder
+
+    def resource_type_recorded(self, recorder, resource_type):
+        group = recorder.get("recordingGroup") or {}
+        use_only = (group.get("recordingStrategy") or {}).get("useOnly")
+        if use_only == "EXCLUSION_BY_RESOURCE_TYPES":
+            return resource_type not in (group.get("exclusionByResourceTypes") or {}).get("resourceTypes", [])
+        if use_only != "INCLUSION_BY_RESOURCE_TYPES" and group.get("allSupported", True):
+            return resource_type not in self.GLOBAL_RESOURCE_TYPES or group.get("includeGlobalResourceTypes", False)
+        return resource_type in group.get("resourceTypes", [])
+
+    def check_config_rule(self, recorder):
+        """Fail if the Config rule is not active, does not have its resource types recorded or is failing"""
+
+        state = self.config_rule.get("ConfigRuleState", "ACTIVE")
+        if state not in self.CONFIG_RULE_READY_STATES:
+            raise PreflightFailure(f"Error - Config rule '{self.config_rule_name}' is {state}, it must be ACTIVE")
+
+        if recorder and self.resource_types and not self.skip_wait_for_resource_recording:
+            unrecorded = [t for t in self.resource_types if not self.resource_type_recorded(recorder, t)]
+            skip_output = self.OUTPUT_KEYS["SKIP_WAIT_FOR_RESOURCE_RECORDING"]
+            if unrecorded == self.resource_types:
+                raise PreflightFailure(
+                    f"Error - AWS Config configuration recorder '{recorder['name']}' does not record the resource "
+                    f"types {unrecorded} in Config rule '{self.config_rule_name}' scope, so critter would wait for "
+                    f"the test resources forever. Record the resource types or specify the test stack output "
+                    f"'{skip_output}'."
+                )
+            if unrecorded:
+                logger.warning(
+                    f"Warning - AWS Config configuration recorder '{recorder['name']}' does not record the resource "
+                    f"types {unrecorded} in Config rule '{self.config_rule_name}' scope"
+                )
+
+        if self.rule_code_dir() is not None:
+            # The failing code is about to be replaced
             return
+        status = self.api_call(
+            "config.DescribeConfigRuleEvaluationStatus",
+            self.config.describe_config_rule_evaluation_status,
+            ConfigRuleNames=[self.config_rule_name],
+        )["ConfigRulesEvaluationStatus"][0]
+        last_failed = status.get("LastFailedInvocationTime") or status.get("LastFailedEvaluationTime")
+        last_succeeded = status.get("LastSuccessfulInvocationTime")
+        if status.get("LastErrorCode") and last_failed and (not last_succeeded or last_failed > last_succeeded):
+            raise PreflightFailure(
+                f"Error - Config rule '{self.config_rule_name}' most recent evaluation failed with "
+                f"{status['LastErrorCode']}: {status.get('LastErrorMessage', '')}\nFix the rule or specify "
+                f"'{self.SKIP_PREFLIGHT_ARG}' to test it anyway."
+            )
 
-        logger.info(f"Waiting for {len(self.resources)} resources to be recorded by AWS Config")
-        logger.info(
-            f"Searching for resource types {self.resource_types} and resource ids {list(self.resources.keys())}"
-        )
+    def wait_for_config_resources(self):
+        """Wait once for the resources of every Config rule tested by the stack to be recorded"""
 
+        skip_msg = "Skipping waiting for resources to be recorded by AWS Config"
+        resource_ids = []
+        resource_types = []
         resource_keys = []
-        for r_id in self.resources.keys():
-            for r_type in self.resource_types:
-                resource_keys.append({"resourceType": r_type, "resourceId": r_id})
+        for rule_test in self.get_config_rule_tests():
+            if rule_test.skip_wait_for_resource_recording:
+                logger.info(skip_msg)
+                continue
+            if not rule_test.resource_types:
+                logger.warning(
+                    f"Warning - {skip_msg}. Config rule '{rule_test.config_rule_name}' scope does not specify "
+                    "applicable resource types."
+                )
+                continue
+
+            for r_id in rule_test.resources.keys():
+                if r_id not in resource_ids:
+                    resource_ids.append(r_id)
+                for r_type in rule_test.resource_types:
+                    if r_type not in resource_types:
+                        resource_types.append(r_type)
+                    resource_key = {"resourceType": r_type, "resourceId": r_id}
+                    if resource_key not in resource_keys:
+                        resource_keys.append(resource_key)
+
+        if not resource_keys:
+            return
+
+        logger.info(f"Waiting for {len(resource_ids)} resources to be recorded by AWS Config")
+        logger.info(f"Searching for resource types {resource_types} and resource ids {resource_ids}")
 
         found_config_resources = []
         loop = 0
-        while len(found_config_resources) != len(self.resources):
+        warned = False
+        while len(found_config_resources) != len(resource_ids):
             if loop:
                 time.sleep(self.AWS_CONFIG_API_DELAY_SEC)
 
-            found_config_resources = self.config.batch_get_resource_config(resourceKeys=resource_keys)[
-                "baseConfigurationItems"
-            ]
+            found_config_resources = self.api_call(
+                "config.BatchGetResourceConfig", self.config.batch_get_resource_config, resourceKeys=resource_keys
+            )["baseConfigurationItems"]
             logger.info(f"Found {len(found_config_resources)} resources recorded by AWS Config")
 
-            # TODO: if loop has run for longer than is typically expected, print help message
-            # if loop * self.AWS_CONFIG_API_DELAY_SEC > 180:
-            #     logger.warning(
-            #         "Warning - Still waiting for resources to be recorded by AWS Config. Ensure "
-            #         f"{self.resource_types} are recorded by AWS Config or consider specifying the critter test stack "
-            #         f"output '{self.OUTPUT_KEYS['SKIP_WAIT_FOR_RESOURCE_RECORDING']}'."
-            #     )
+            waited = loop * self.AWS_CONFIG_API_DELAY_SEC
+            if len(found_config_resources) != len(resource_ids) and waited >= self.RESOURCE_RECORDING_WARNING_SEC:
+                found_resource_ids = [i["resourceId"] for i in found_config_resources]
+                help_msg = (
+                    f"Ensure {resource_types} are recorded by AWS Config or consider specifying the critter test stack "
+                    f"output '{self.OUTPUT_KEYS['SKIP_WAIT_FOR_RESOURCE_RECORDING']}'."
+                )
+                if waited >= self.RESOURCE_RECORDING_TIMEOUT_SEC:
+                    raise Exception(
+                        f"Error - Resources {[r for r in resource_ids if r not in found_resource_ids]} were not "
+                        f"recorded by AWS Config within {self.RESOURCE_RECORDING_TIMEOUT_SEC} seconds. {help_msg}"
+                    )
+                if not warned:
+                    logger.warning(f"Warning - Still waiting for resources to be recorded by AWS Config. {help_msg}")
+                    warned = True
 
             loop += 1
 
+        # Keep the configuration item capture times for the latency report
+        capture_times = {i["resourceId"]: i.get("configurationItemCaptureTime") for i in found_config_resources}
+        for rule_test in self.get_config_rule_tests():
+            for r_id, resource in rule_test.resources.items():
+                if r_id in capture_times:
+                    resource["configuration_item_capture_time"] = capture_times[r_id]
+
+    def rule_code_dir(self):
+        """Lambda function code pushed to the Config rule, None if its code is not updated"""
+
+        if not self.rule_code:
+            return None
+        if self.config_rule_name in self.rule_code:
+            return self.rule_code[self.config_rule_name]
+        if self.config_rule["Source"].get("Owner") == "CUSTOM_LAMBDA":
+            return self.rule_code.get(self.RULE_CODE_ALL_RULES)
+        return None
+
+    def update_rule_code(self, rule_tests):
+        """Push the Lambda function code of every tested Config rule not updated yet"""
+
+        for rule_test in rule_tests:
+            if rule_test.config_rule_name in self.updated_config_rules:
+                continue
+            code_dir = rule_test.rule_code_dir()
+            if code_dir is not None:
+                rule_test.update_rule_function_code(code_dir)
+            self.updated_config_rules.add(rule_test.config_rule_name)
+
+    def update_rule_function_code(self, code_dir):
+        """Update the code of the Lambda function behind the Config rule, skipped if the code hash is unchanged"""
+
+        source = self.config_rule["Source"]
+        if source.get("Owner") != "CUSTOM_LAMBDA":
+            raise Exception(
+                f"Error - Config rule '{self.config_rule_name}' is owned by {source.get('Owner')}, only the code of "
+                f"CUSTOM_LAMBDA rules can be pushed with '{self.RULE_CODE_ARG}'"
+            )
+        lambda_client = self.get_client("lambda")
+        function_arn = source["SourceIdentifier"]
+
+        zip_file = self.package_rule_code(code_dir)
+        # Lambda reports CodeSha256 as the base64 encoded SHA-256 digest of the deployment package
+        code_sha256 = base64.b64encode(hashlib.sha256(zip_file).digest()).decode("utf-8")
+        function = self.api_call(
+            "lambda.GetFunctionConfiguration", lambda_client.get_function_configuration, FunctionName=function_arn
+        )
+        if function["CodeSha256"] == code_sha256:
+            logger.info(
+                f"Config rule '{self.config_rule_name}' Lambda function '{function['FunctionName']}' code is unchanged"
+            )
+            return
+
+        logger.info(
+            f"Updating Config rule '{self.config_rule_name}' Lambda function '{function['FunctionName']}' code "
+            f"from '{code_dir}'"
+        )
+        self.api_call(
+            "lambda.UpdateFunctionCode", lambda_client.update_function_code, FunctionName=function_arn, ZipFile=zip_file
+        )
+        loop = 0
+        while True:
+            if loop:
+                time.sleep(self.LAMBDA_UPDATE_DELAY_SEC)
+            loop += 1
+            function = self.api_call(
+                "lambda.GetFunctionConfiguration", lambda_client.get_function_configuration, FunctionName=function_arn
+            )
+            update_status = function.get("LastUpdateStatus", "Successful")
+            if update_status == "Successful":
+                break
+            if update_status == "Failed":
+                raise Exception(
+                    f"Error - Lambda function '{function['FunctionName']}' code update failed: "
+                    f"{function.get('LastUpdateStatusReason', '')}"
+                )
+        logger.info(f"Updated Lambda function '{function['FunctionName']}' code")
+
+    def package_rule_code(self, code_dir):
+        """Zip the Lambda function code like 'aws cloudformation package'.
+
+        Files are added in a fixed order with fixed timestamps, so unchanged code always has the same hash.
+        """
+
+        if os.path.isfile(code_dir) and code_dir.endswith(".zip"):
+            with open(code_dir, "rb") as f:
+                return f.read()
+
+        if os.path.isfile(code_dir):
+            paths = [(code_dir, os.path.basename(code_dir))]
+        else:
+            paths = []
+            for root, dirs, files in os.walk(code_dir):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    paths.append((path, os.path.relpath(path, code_dir).replace(os.sep, "/")))
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for path, arcname in paths:
+                info = zipfile.ZipInfo(arcname, date_time=(1980, 1, 1, 0, 0, 0))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = (0o755 if os.access(path, os.X_OK) else 0o644) << 16
+                with open(path, "rb") as f:
+                    zip_file.writestr(info, f.read())
+        return buffer.getvalue()
+
+    def config_rule_trigger_types(self):
+        """Return (change_triggered, periodic) for the Config rule"""
+
+        source = self.config_rule["Source"]
+        if source.get("SourceDetails"):
+            message_types = [d.get("MessageType") for d in source["SourceDetails"]]
+            change_triggered = any(t in self.CHANGE_TRIGGER_MESSAGE_TYPES for t in message_types)
+            periodic = any(t in self.PERIODIC_TRIGGER_MESSAGE_TYPES for t in message_types)
+        else:
+            # Managed rules do not declare source details. Their triggers follow the rule scope and frequency.
+            change_triggered = bool(self.config_rule.get("Scope"))
+            periodic = "MaximumExecutionFrequency" in self.config_rule
+        return change_triggered, periodic
+
+    def plan_config_rule_evaluation(self):
+        """Choose the fastest reliable way to get the test resources evaluated by the Config rule"""
+
+        change_triggered, periodic = self.config_rule_trigger_types()
+        if self.trigger_rule_evaluation:
+            self.evaluation_strategy = self.EVALUATION_STRATEGY_TRIGGER
+            reason = f"'{self.TRIGGER_RULE_EVALUATION_ARG}' was specified"
+        elif self.rule_code_dir() is not None:
+            # Change triggered evaluations may have run the previous code
+            self.evaluation_strategy = self.EVALUATION_STRATEGY_TRIGGER
+            reason = f"the rule code is pushed with '{self.RULE_CODE_ARG}'"
+        elif not change_triggered:
+            self.evaluation_strategy = self.EVALUATION_STRATEGY_TRIGGER
+            frequency = self.config_rule.get("MaximumExecutionFrequency", "<None>")
+            reason = f"the rule is not triggered by configuration changes (maximum execution frequency {frequency})"
+        elif self.deploy_action_performed != "CREATE":
+            # Resources that did not change in this deploy are not re-evaluated by change triggered rules
+            self.evaluation_strategy = self.EVALUATION_STRATEGY_TRIGGER
+            reason = f"CloudFormation stack '{self.stack_name}' already existed"
+        else:
+            self.evaluation_strategy = self.EVALUATION_STRATEGY_WAIT_FOR_CHANGE
+            reason = "the rule is triggered by configuration changes of the newly created resources"
+
+        logger.info(
+            f"Config rule '{self.config_rule_name}' evaluation strategy: {self.evaluation_strategy} ({reason}). "
+            f"Change triggered: {change_triggered}, periodic: {periodic}"
+        )
+
     def start_config_rule_evaluation(self):
-        if not self.trigger_rule_evaluation:
+        if self.evaluation_strategy != self.EVALUATION_STRATEGY_TRIGGER:
             return
 
         logger.info(f"Triggering Config rule '{self.config_rule_name}' evaluation")
-        try:
-            self.config.start_config_rules_evaluation(ConfigRuleNames=[self.config_rule_name])
-        except botocore.exceptions.ClientError as e:
-            if e.response["Error"]["Code"] == "LimitExceededException":
-                logger.info(
-                    "Encountered LimitExceededException when calling Config StartConfigRulesEvaluation api, "
-                    "sleeping before retry"
-                )
-                time.sleep(self.AWS_CONFIG_API_DELAY_SEC)
-                self.start_config_rule_evaluation()
-            else:
-                raise e
+        self.api_call(
+            "config.StartConfigRulesEvaluation",
+            self.config.start_config_rules_evaluation,
+            ConfigRuleNames=[self.config_rule_name],
+        )
+        self.evaluation_triggered_time = datetime.datetime.now(datetime.timezone.utc)
 
     def wait_for_config_evaluation(self):
-        for r_id in list(self.resources.keys()):
-            if self.resources[r_id]["expected_compliance_type"] == "NOT_APPLICABLE":
-                # TODO: Determine some way to test for this. NOT_APPLICABLE evaluations are not stored by Config.
-                #       Search thru recent PutEvaluations events in CloudTrail and look for the resource id?
-                logger.warning(
-                    f"Warning - Verifying resource '{r_id}' compliance 'NOT_APPLICABLE' is not yet implemented"
-                )
+        not_applicable_resource_ids = [
+            r_id for r_id, r in self.resources.items() if r["expected_compliance_type"] == "NOT_APPLICABLE"
+        ]
+        owner = self.config_rule["Source"].get("Owner")
+        if not_applicable_resource_ids and owner != "CUSTOM_LAMBDA":
+            logger.warning(
+                f"Warning - Config rule '{self.config_rule_name}' is owned by {owner}, its evaluations are not logged "
+                f"by CloudTrail. Skipping verification of resource ids {not_applicable_resource_ids} compliance "
+                "'NOT_APPLICABLE'."
+            )
+            for r_id in not_applicable_resource_ids:
                 self.resources.pop(r_id)
-                break
+            not_applicable_resource_ids = []
 
-        last_stack_event_timestamp = list(self.stack.events.limit(count=1))[0].timestamp
+        if self.last_stack_event_timestamp is None:
+            self.last_stack_event_timestamp = self.get_last_stack_event_timestamp()
+        last_stack_event_timestamp = self.last_stack_event_timestamp
 
         # TODO: This loop may be unnecessary. This loop waits for the Config rule evaluation to succeed. The loop below
         #       waits for the each of the test resources to be evaluated.
         logger.info(f"Waiting for Config rule '{self.config_rule_name}' successful evaluation")
         loop = 0
         while True:
-            if loop or self.trigger_rule_evaluation:
-                time.sleep(self.AWS_CONFIG_API_DELAY_SEC)
+            if loop or self.evaluation_strategy == self.EVALUATION_STRATEGY_TRIGGER:
+                self.evaluation_sleep(self.AWS_CONFIG_API_DELAY_SEC)
             loop += 1
 
-            status = self.config.describe_config_rule_evaluation_status(ConfigRuleNames=[self.config_rule_name])[
-                "ConfigRulesEvaluationStatus"
-            ][0]
+            status = self.api_call(
+                "config.DescribeConfigRuleEvaluationStatus",
+                self.config.describe_config_rule_evaluation_status,
+                ConfigRuleNames=[self.config_rule_name],
+            )["ConfigRulesEvaluationStatus"][0]
 
             if "LastSuccessfulInvocationTime" not in status:
                 logger.warning(
@@ -447,51 +1464,370 @@ class Stack:
                 break
 
         loop = 0
-        unevaluated_resource_ids = list(self.resources.keys())
+        unevaluated_resource_ids = [r_id for r_id in self.resources if r_id not in not_applicable_resource_ids]
         while len(unevaluated_resource_ids):
             logger.info(
                 f"Waiting for Config rule '{self.config_rule_name}' evaluation of "
                 f"resource ids {unevaluated_resource_ids}"
             )
             if loop:
-                time.sleep(self.AWS_CONFIG_API_DELAY_SEC)
+                self.evaluation_sleep(self.AWS_CONFIG_API_DELAY_SEC)
             loop += 1
 
-            for pg in self.config.get_paginator("get_compliance_details_by_config_rule").paginate(
-                ConfigRuleName=self.config_rule_name
-            ):
-                for result in pg["EvaluationResults"]:
-                    qualifier = result["EvaluationResultIdentifier"]["EvaluationResultQualifier"]
-                    r_id = qualifier["ResourceId"]
+            for result in self.get_compliance_details():
+                qualifier = result["EvaluationResultIdentifier"]["EvaluationResultQualifier"]
+                r_id = qualifier["ResourceId"]
 
-                    if r_id not in self.resources.keys():
-                        continue
+                if r_id not in self.resources.keys():
+                    continue
 
-                    self.resources[r_id]["resource_type"] = qualifier["ResourceType"]
+                self.resources[r_id]["resource_type"] = qualifier["ResourceType"]
 
-                    # Warn the user if evaluation result was posted before stack deploy finished
-                    if result["ResultRecordedTime"] < last_stack_event_timestamp:
-                        logger.warning(
-                            f"Warning - Resource '{r_id}' Config evaluation was recorded before the most recent event "
-                            f"on CloudFormation stack '{self.stack_name}'. This may be an indicator of unreliable test "
-                            f"results. Consider specifying '{self.TRIGGER_RULE_EVALUATION_ARG}'."
-                        )
-                    self.resources[r_id]["evaluation_result"] = result
+                # Warn the user if evaluation result was posted before stack deploy finished
+                if result["ResultRecordedTime"] < last_stack_event_timestamp:
+                    logger.warning(
+                        f"Warning - Resource '{r_id}' Config evaluation was recorded before the most recent event "
+                        f"on CloudFormation stack '{self.stack_name}'. This may be an indicator of unreliable test "
+                        f"results. Consider specifying '{self.TRIGGER_RULE_EVALUATION_ARG}'."
+                    )
+                self.resources[r_id]["evaluation_result"] = result
 
             unevaluated_resource_ids = []
             for r_id in self.resources.keys():
-                if not self.resources[r_id]["evaluation_result"]:
+                if not self.resources[r_id]["evaluation_result"] and r_id not in not_applicable_resource_ids:
                     unevaluated_resource_ids.append(r_id)
 
+        self.wait_for_not_applicable_evaluations(
+            [r_id for r_id in not_applicable_resource_ids if not self.resources[r_id]["evaluation_result"]]
+        )
+
+    def wait_for_not_applicable_evaluations(self, resource_ids):
+        """Verify NOT_APPLICABLE evaluations, which AWS Config does not store, from CloudTrail PutEvaluations events.
+
+        Each poll looks up the events of the window from the last stack event to now once and indexes the evaluations
+        the rule's Lambda function submitted by resource id, however many resources are waiting.
+        """
+
+        if not resource_ids:
+            return
+
+        # arn:aws:lambda:REGION:ACCOUNT:function:NAME[:QUALIFIER]
+        function_name = self.config_rule["Source"]["SourceIdentifier"].split(":")[6]
+        loop = 0
+        while resource_ids:
+            logger.info(
+                f"Waiting for CloudTrail PutEvaluations events of Config rule '{self.config_rule_name}' for resource "
+                f"ids {resource_ids}"
+            )
+            if loop:
+                self.evaluation_sleep(self.CLOUDTRAIL_API_DELAY_SEC)
+            loop += 1
+
+            evaluations = self.index_evaluation_events(function_name)
+            for r_id in [r for r in resource_ids if r in evaluations]:
+                evaluation = evaluations[r_id]
+                self.resources[r_id]["resource_type"] = evaluation["complianceResourceType"]
+                result = {
+                    "EvaluationResultIdentifier": {
+                        "EvaluationResultQualifier": {
+                            "ConfigRuleName": self.config_rule_name,
+                            "ResourceType": evaluation["complianceResourceType"],
+                            "ResourceId": r_id,
+                        }
+                    },
+                    "ComplianceType": evaluation["complianceType"],
+                    "ResultRecordedTime": evaluation["EventTime"],
+                }
+                if evaluation.get("annotation"):
+                    result["Annotation"] = evaluation["annotation"]
+                self.resources[r_id]["evaluation_result"] = result
+                resource_ids.remove(r_id)
+
+            if resource_ids and loop * self.CLOUDTRAIL_API_DELAY_SEC >= self.NOT_APPLICABLE_TIMEOUT_SEC:
+                logger.warning(
+                    f"Warning - Did not find CloudTrail PutEvaluations events of Config rule '{self.config_rule_name}' "
+                    f"for resource ids {resource_ids} within {self.NOT_APPLICABLE_TIMEOUT_SEC} seconds. Ensure "
+                    f"CloudTrail management events are logged and Lambda function '{function_name}' evaluated them."
+                )
+                return
+
+    def index_evaluation_events(self, function_name):
+        """Return resource id -> the most recent evaluation submitted by the Lambda function since the last stack
+        event, in one pass over the CloudTrail PutEvaluations events"""
+
+        cloudtrail = self.get_client("cloudtrail")
+        kwargs = {
+            "LookupAttributes": [{"AttributeKey": "EventName", "AttributeValue": "PutEvaluations"}],
+            "StartTime": self.last_stack_event_timestamp,
+            "EndTime": datetime.datetime.now(datetime.timezone.utc),
+        }
+        evaluations = {}
+        while True:
+            page = self.api_call("cloudtrail.LookupEvents", cloudtrail.lookup_events, **kwargs)
+            for event in page["Events"]:
+                detail = json.loads(event["CloudTrailEvent"])
+                # Lambda functions call PutEvaluations with their execution role, in a session named after the function
+                if detail.get("errorCode") or not detail["userIdentity"].get("arn", "").endswith(f"/{function_name}"):
+                    continue
+                for evaluation in (detail.get("requestParameters") or {}).get("evaluations", []):
+                    r_id = evaluation["complianceResourceId"]
+                    if r_id not in evaluations or event["EventTime"] > evaluations[r_id]["EventTime"]:
+                        evaluations[r_id] = {**evaluation, "EventTime": event["EventTime"]}
+            if not page.get("NextToken"):
+                return evaluations
+            kwargs["NextToken"] = page["NextToken"]
+
+    def get_last_stack_event_timestamp(self):
+        return self.api_call(
+            "cloudformation.DescribeStackEvents", self.cfn.describe_stack_events, StackName=self.stack_name
+        )["StackEvents"][0]["Timestamp"]
+
+    def evaluation_sleep(self, seconds):
+        """Sleep between evaluation polls, waking up early if a parallel evaluation of the stack failed"""
+
+        if self.stop_evaluation is None:
+            time.sleep(seconds)
+        elif self.stop_evaluation.wait(seconds):
+            raise EvaluationCancelled(f"Stopped waiting for Config rule '{self.config_rule_name}' evaluation")
+
+    def get_compliance_details(self):
+        """Yield the Config rule evaluation results. Each page is a separate rate limited api call."""
+
+        kwargs = {"ConfigRuleName": self.config_rule_name}
+        while True:
+            page = self.api_call(
+                "config.GetComplianceDetailsByConfigRule", self.config.get_compliance_details_by_config_rule, **kwargs
+            )
+            yield from page["EvaluationResults"]
+            if not page.get("NextToken"):
+                return
+            kwargs["NextToken"] = page["NextToken"]
+
+    def wait_for_config_evaluations(self):
+        """Wait on the evaluations of every Config rule tested by the stack at the same time"""
+
+        # The last stack event is usually seen while deploying. Otherwise it is read once for every rule instead of
+        # once per evaluation thread.
+        if self.last_stack_event_timestamp is None:
+            self.last_stack_event_timestamp = self.get_last_stack_event_timestamp()
+        rule_tests = self.get_config_rule_tests()
+        for rule_test in rule_tests:
+            rule_test.last_stack_event_timestamp = self.last_stack_event_timestamp
+
+        # Evaluations are started before waiting on any of them, a resumed run does not trigger them again
+        if not self.phase_completed("start_config_rule_evaluation"):
+            for rule_test in rule_tests:
+                rule_test.start_config_rule_evaluation()
+            self.checkpoint("start_config_rule_evaluation")
+
+        if len(rule_tests) == 1:
+            rule_tests[0].wait_for_config_evaluation()
+            return
+
+        stop_evaluation = threading.Event()
+        for rule_test in rule_tests:
+            rule_test.stop_evaluation = stop_evaluation
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(rule_tests)) as executor:
+            futures = [executor.submit(rule_test.wait_for_config_evaluation) for rule_test in rule_tests]
+            try:
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+            except KeyboardInterrupt as e:
+                # Shutting down the executor waits for the threads, stop them first
+                stop_evaluation.set()
+                raise e
+            # Raise the first failure once the remaining evaluations have noticed the stop signal
+            failed = [f for f in futures if f in done and f.exception() is not None]
+            if failed:
+                stop_evaluation.set()
+        if failed:
+            raise failed[0].exception()
+
+    def phase_completed(self, phase):
+        return self.phase is not None and self.RUN_PHASES.index(self.phase) >= self.RUN_PHASES.index(phase)
+
+    def run_state_dict(self):
+        rule_tests = []
+        # Rule tests are known once the stack outputs are processed
+        for rule_test in self.get_config_rule_tests() if self.phase_completed("process_outputs") else []:
+            rule_tests.append(
+                {
+                    "output_prefix": rule_test.output_prefix,
+                    "config_rule_name": rule_test.config_rule_name,
+                    "config_rule": rule_test.config_rule,
+                    "resource_types": rule_test.resource_types,
+                    "skip_wait_for_resource_recording": rule_test.skip_wait_for_resource_recording,
+                    "evaluation_strategy": rule_test.evaluation_strategy,
+                    "evaluation_triggered_time": rule_test.evaluation_triggered_time,
+                    "resources": rule_test.resources,
+                }
+            )
+        return {
+            "phase": self.phase,
+            "stack_name": self.stack_name,
+            "stack_id": self.stack_id,
+            "template_sha256": hashlib.sha256(self.template_body.encode("utf-8")).hexdigest(),
+            "deploy_action_performed": self.deploy_action_performed,
+            "stack_outputs": self.stack_outputs,
+            "config_rule_tests": rule_tests,
+        }
+
+    def checkpoint(self, phase):
+        """Record that a phase completed and save the progress to the run state file"""
+
+        self.phase = phase
+        self.save_run_state()
+
+    def save_run_state(self):
+        if not self.run_state or not self.phase:
+            return
+        try:
+            self.run_state.save(self.run_state_dict())
+        except OSError as e:
+            logger.warning(f"Warning - Unable to save run state '{self.run_state.path}': {e!r}")
+
+    def save_interrupted_run_state(self):
+        """Save the progress of a stopped test, including the evaluation results found so far"""
+
+        if not self.run_state or not self.phase:
+            return
+        self.save_run_state()
+        logger.error(
+            f"Saved run state to '{self.run_state.path}'. Continue the test with "
+            f"'critter {self.template_file} {self.RESUME_ARG}'.\n"
+        )
+
+    def remove_run_state(self):
+        if self.run_state:
+            self.run_state.remove()
+
+    def restore_run_state(self):
+        """Load a saved run state in place of the phases it completed. The deployed stack must be unchanged."""
+
+        state = self.run_state.load()
+        if state["stack_name"] != self.stack_name:
+            raise Exception(
+                f"Error - Run state '{self.run_state.path}' belongs to CloudFormation stack '{state['stack_name']}', "
+                f"not '{self.stack_name}'"
+            )
+        if state["template_sha256"] != hashlib.sha256(self.template_body.encode("utf-8")).hexdigest():
+            raise Exception(
+                f"Error - Template '{self.template_file}' changed since the interrupted run. Run the test without "
+                f"'{self.RESUME_ARG}'."
+            )
+
+        try:
+            stack = self.api_call("cloudformation.DescribeStacks", self.cfn.describe_stacks, StackName=self.stack_name)[
+                "Stacks"
+            ][0]
+        except botocore.exceptions.ClientError as e:
+            if "does not exist" not in e.response["Error"].get("Message", ""):
+                raise e
+            stack = None
+        if not stack or stack["StackId"] != state["stack_id"] or not stack["StackStatus"].endswith("_COMPLETE"):
+            raise Exception(
+                f"Error - CloudFormation stack '{state['stack_id']}' from the interrupted run is no longer deployed. "
+                f"Run the test without '{self.RESUME_ARG}'."
+            )
+
+        self.phase = state["phase"]
+        self.stack_id = state["stack_id"]
+        self.deploy_action_performed = state["deploy_action_performed"]
+        self.stack_snapshot = stack
+
+        if self.phase_completed("process_outputs"):
+            self.stack_outputs = state["stack_outputs"]
+            rule_test_states = state["config_rule_tests"]
+            if [t["output_prefix"] for t in rule_test_states] == [""]:
+                self.config_rule_tests = None
+            else:
+                self.config_rule_tests = [copy.copy(self) for _ in rule_test_states]
+            for rule_test, rule_test_state in zip(self.get_config_rule_tests(), rule_test_states):
+                for attribute, value in rule_test_state.items():
+                    setattr(rule_test, attribute, value)
+                rule_test.config_rule_tests = None
+            self.config_rule_name = ", ".join([t.config_rule_name for t in self.get_config_rule_tests()])
+
+        logger.info(
+            f"Resuming test of CloudFormation stack '{self.stack_id}' after phase '{self.phase}' from run state "
+            f"'{self.run_state.path}'"
+        )
+
+    def report_latency(self):
+        """Log per-rule evaluation latency percentiles and record them in the latency history"""
+
+        for rule_test in self.get_config_rule_tests():
+            timestamps = []
+            for resource in rule_test.resources.values():
+                result = resource["evaluation_result"]
+                if not result:
+                    continue
+                timestamps.append(
+                    {
+                        "last_stack_event_timestamp": rule_test.last_stack_event_timestamp,
+                        "configuration_item_capture_time": resource.get("configuration_item_capture_time"),
+                        "config_rule_invoked_time": result.get("ConfigRuleInvokedTime"),
+                        "result_recorded_time": result.get("ResultRecordedTime"),
+                    }
+                )
+            if not timestamps:
+                continue
+
+            report = latency.LatencyReport(rule_test.config_rule_name, timestamps)
+            report.log()
+            if not self.latency_history:
+                continue
+
+            history = latency.LatencyHistory(self.latency_history)
+            try:
+                for regression in history.regressions(report):
+                    logger.warning(
+                        f"Warning - Config rule '{rule_test.config_rule_name}' evaluation latency regressed: "
+                        f"{regression}"
+                    )
+            except (json.JSONDecodeError, KeyError, OSError) as e:
+                logger.warning(f"Warning - Unable to read latency history '{self.latency_history}': {e!r}")
+            try:
+                history.append(report, self.stack_name)
+            except OSError as e:
+                logger.warning(f"Warning - Unable to write latency history '{self.latency_history}': {e!r}")
+
+    def validate_config_evaluations(self):
+        rule_tests = self.get_config_rule_tests()
+        if len(rule_tests) == 1:
+            rule_tests[0].validate_config_evaluation()
+            return
+
+        failures = []
+        for rule_test in rule_tests:
+            try:
+                rule_test.validate_config_evaluation()
+            except TestFailure as e:
+                failures.append(f"Config rule '{rule_test.config_rule_name}' - {e}")
+                error = e
+            else:
+                error = None
+            self.rule_results.append(
+                TestResult(
+                    self.stack_name,
+                    config_rule_name=rule_test.config_rule_name,
+                    resources=rule_test.resources,
+                    error=error,
+                )
+            )
+
+        if failures:
+            raise TestFailure("\n".join(failures))
+
     def validate_config_evaluation(self):
         logger.info(f"Validating Config rule '{self.config_rule_name}' evaluation results")
 
         print()  # printing a blank line for console output readability
         failed_resource_ids = []
         for resource_id, resource in self.resources.items():
-            resource_type = resource["resource_type"]
+            # NOT_APPLICABLE evaluations not found in CloudTrail have no result
+            resource_type = resource.get("resource_type", "<Unknown>")
             expected = resource["expected_compliance_type"]
-            actual = resource["evaluation_result"]["ComplianceType"]
+            actual = resource["evaluation_result"].get("ComplianceType", "<None>")
 
             # TODO: test for expected annotation values
 
@@ -515,14 +1851,109 @@ class Stack:
         if failed_resource_ids:
             raise TestFailure(f"Failed resource ids: {failed_resource_ids}")
 
+    def api_call(self, operation, fn, **kwargs):
+        """Make a rate limited api call, counted against the test's api call budget"""
+
+        if self.api_calls is not None:
+            self.api_calls.count(operation)
+        return self.limiter.call(operation, fn, **kwargs)
+
+    def check_api_call_budget(self):
+        if self.api_calls is None:
+            return
+        total = self.api_calls.total
+        logger.info(f"Made {total} AWS api calls")
+        logger.debug(f"AWS api calls per operation: {dict(self.api_calls.counts)}")
+        if self.max_api_calls is not None and total > self.max_api_calls:
+            raise ApiCallBudgetExceeded(
+                f"The test made {total} AWS api calls, more than the budget of {self.max_api_calls} "
+                f"('{self.MAX_API_CALLS_ARG}'). Calls per operation: {dict(self.api_calls.counts.most_common())}"
+            )
+
     def delete(self):
         logger.info(
             f"Deleting CloudFormation stack '{self.stack_name}' - specify '{self.DELETE_STACK_ARG}' "
             "to control this behavior"
         )
-        self.cfn.delete_stack(StackName=self.stack_name)
+        self.api_call("cloudformation.DeleteStack", self.cfn.delete_stack, StackName=self.stack_name)
         logger.info(f"Waiting for CloudFormation stack '{self.stack_name}' delete to complete")
-        self.cfn.get_waiter("stack_delete_complete").wait(
-            StackName=self.stack_name, WaiterConfig=self.CFN_WAITER_CONFIG
-        )
+        self.wait_for_stack_delete()
         logger.info(f"Deleted CloudFormation stack '{self.stack_name}'")
+
+    def status_poller(self):
+        return status_poller.for_client(self.cfn)
+
+    def wait_for_stack_delete(self):
+        stack_status = self.status_poller().wait(
+            self.stack_name, lambda status: status in ["DELETE_COMPLETE", "DELETE_FAILED"]
+        )
+        if stack_status == "DELETE_FAILED":
+            raise Exception(f"Error - CloudFormation stack '{self.stack_name}' delete failed")
+
+
+class FixtureStacks:
+    """Shared dependency stacks for a session of critter tests.
+
+    Fixture stacks are deployed once before the first test that needs them and their outputs are passed to the test
+    stacks as template parameters. They are deleted once after the last test, following the same delete_stack
+    setting as the test stacks. Resources exported by a fixture stack can also be imported with Fn::ImportValue.
+    """
+
+    def __init__(self, template_files, stack_names=None, clients=None, **configure_kwargs):
+        self.clients = {} if clients is None else clients
+        self.stacks = []
+        for i, template_file in enumerate(template_files):
+            stack = Stack()
+            if stack_names:
+                stack_name = stack_names[i]
+            else:
+                template_filename = os.path.splitext(os.path.basename(str(template_file)))[0]
+                stack_name = Stack.FIXTURE_STACK_NAME_PREFIX + template_filename.replace("_", "-")
+            stack.configure(template_file, stack_name=stack_name, **configure_kwargs)
+            self.stacks.append(stack)
+        self.deployed = []
+        self.outputs = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def deploy(self):
+        """Deploy the fixture stacks on the first call and return their combined outputs"""
+
+        with self._lock:
+            # A failed deploy fails every test using the fixtures without deploying again
+            if self.error:
+                raise self.error
+            if self.outputs is not None:
+                return self.outputs
+
+            try:
+                outputs = {}
+                for stack in self.stacks:
+                    logger.info(f"Deploying fixture CloudFormation template '{stack.template_file}'")
+                    stack.initialize_boto_clients(self.clients)
+                    self.deployed.append(stack)
+                    stack.deploy()
+                    for key, value in stack.get_stack_outputs().items():
+                        if key in outputs:
+                            raise Exception(f"Error - Output '{key}' is declared by more than one fixture stack")
+                        outputs[key] = value
+            except Exception as e:
+                self.error = e
+                raise e
+            self.outputs = outputs
+            return self.outputs
+
+    def teardown(self, passed):
+        """Delete the deployed fixture stacks in reverse order. passed is True if every test using them passed."""
+
+        for stack in reversed(self.deployed):
+            if stack.delete_stack == Stack.DELETE_STACK_ALWAYS or (
+                passed and stack.delete_stack == Stack.DELETE_STACK_ON_SUCCESS
+            ):
+                stack.delete()
+            else:
+                logger.info(
+                    f"Not deleting fixture CloudFormation stack '{stack.stack_name}', specify "
+                    f"'{Stack.DELETE_STACK_ARG}' to control this behavior"
+                )
+        self.deployed = []
@@ -0,0 +1,131 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import logging
+import threading
+import time
+import weakref
+from . import throttle
+
+logger = logging.getLogger(__name__)
+
+
+class StackStatusPoller:
+    """Shares CloudFormation stack status polling between every stack waiting in the process.
+
+    Instead of one DescribeStacks call per waiting stack, one waiting thread at a time refreshes the status of all
+    tracked stacks with a few ListStacks pages and wakes the other waiting threads.
+    """
+
+    POLL_INTERVAL_SEC = 15
+    # Every status except DELETE_COMPLETE. Deleted stacks are kept in ListStacks for 90 days, so they are filtered
+    # out and a tracked stack missing from the results has been deleted.
+    STACK_STATUS_FILTER = [
+        "CREATE_IN_PROGRESS",
+        "CREATE_FAILED",
+        "CREATE_COMPLETE",
+        "ROLLBACK_IN_PROGRESS",
+        "ROLLBACK_FAILED",
+        "ROLLBACK_COMPLETE",
+        "DELETE_IN_PROGRESS",
+        "DELETE_FAILED",
+        "UPDATE_IN_PROGRESS",
+        "UPDATE_COMPLETE_CLEANUP_IN_PROGRESS",
+        "UPDATE_COMPLETE",
+        "UPDATE_FAILED",
+        "UPDATE_ROLLBACK_IN_PROGRESS",
+        "UPDATE_ROLLBACK_FAILED",
+        "UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS",
+        "UPDATE_ROLLBACK_COMPLETE",
+        "REVIEW_IN_PROGRESS",
+        "IMPORT_IN_PROGRESS",
+        "IMPORT_COMPLETE",
+        "IMPORT_ROLLBACK_IN_PROGRESS",
+        "IMPORT_ROLLBACK_FAILED",
+        "IMPORT_ROLLBACK_COMPLETE",
+    ]
+
+    def __init__(self, cfn, poll_interval=None, limiter=throttle.limiter):
+        self.cfn = cfn
+        self.poll_interval = self.POLL_INTERVAL_SEC if poll_interval is None else poll_interval
+        self.limiter = limiter
+        self.statuses = {}
+        self.tracked = {}
+        self._condition = threading.Condition()
+        self._refreshing = False
+        self._next_refresh = 0
+        self._started = 0
+        self._completed = 0
+
+    def wait(self, stack_name, is_done):
+        """Block until is_done(status) is true for the stack status and return the status.
+
+        Only refreshes started after the call are considered, so the status reflects stack operations the caller
+        made before waiting.
+        """
+
+        with self._condition:
+            self.tracked[stack_name] = self.tracked.get(stack_name, 0) + 1
+            min_refresh = self._started + 1
+        try:
+            while True:
+                with self._condition:
+                    while True:
+                        status = self.statuses.get(stack_name)
+                        if self._completed >= min_refresh and status and is_done(status):
+                            return status
+                        if not self._refreshing and time.monotonic() >= self._next_refresh:
+                            break
+                        timeout = None if self._refreshing else self._next_refresh - time.monotonic()
+                        self._condition.wait(timeout)
+                    # This thread refreshes the status of every tracked stack
+                    self._refreshing = True
+                    self._started += 1
+                    refresh = self._started
+                    stack_names = list(self.tracked.keys())
+
+                statuses = None
+                try:
+                    statuses = self.list_stack_statuses(stack_names)
+                finally:
+                    with self._condition:
+                        self._refreshing = False
+                        self._next_refresh = time.monotonic() + self.poll_interval
+                        if statuses is not None:
+                            for name, new_status in statuses.items():
+                                if self.statuses.get(name) != new_status:
+                                    logger.debug(f"CloudFormation stack '{name}' status {new_status}")
+                            self.statuses.update(statuses)
+                            self._completed = refresh
+                        self._condition.notify_all()
+        finally:
+            with self._condition:
+                self.tracked[stack_name] -= 1
+                if not self.tracked[stack_name]:
+                    del self.tracked[stack_name]
+                    self.statuses.pop(stack_name, None)
+
+    def list_stack_statuses(self, stack_names):
+        statuses = dict.fromkeys(stack_names, "DELETE_COMPLETE")
+        kwargs = {"StackStatusFilter": self.STACK_STATUS_FILTER}
+        while True:
+            page = self.limiter.call("cloudformation.ListStacks", self.cfn.list_stacks, **kwargs)
+            for summary in page["StackSummaries"]:
+                if summary["StackName"] in statuses:
+                    statuses[summary["StackName"]] = summary["StackStatus"]
+            if not page.get("NextToken"):
+                return statuses
+            kwargs["NextToken"] = page["NextToken"]
+
+
+_pollers = weakref.WeakKeyDictionary()
+_pollers_lock = threading.Lock()
+
+
+def for_client(cfn):
+    """Return the poller shared by every stack using the CloudFormation client"""
+
+    with _pollers_lock:
+        if cfn not in _pollers:
+            _pollers[cfn] = StackStatusPoller(cfn)
+        return _pollers[cfn]
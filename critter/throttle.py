@@ -0,0 +1,177 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import botocore
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottlingError(Exception):
+    pass
+
+
+class TokenBucket:
+    """Token bucket limiting calls to a single AWS api operation.
+
+    The fill rate is reduced when the api throttles and recovers gradually towards the configured rate as calls
+    succeed again.
+    """
+
+    MIN_RATE = 0.05
+    RECOVERY_FACTOR = 0.1
+
+    def __init__(self, rate, burst=1):
+        self.max_rate = float(rate)
+        self.rate = self.max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        # Reserve a token under the lock, a negative balance is paid back by sleeping outside of it
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.rate / 2, min(self.MIN_RATE, self.max_rate))
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate * self.RECOVERY_FACTOR, self.max_rate)
+
+
+class RateLimiter:
+    """Process-wide limiter holding one token bucket per AWS api operation.
+
+    Operations are named '<service>.<OperationName>', i.e. 'config.StartConfigRulesEvaluation'.
+    """
+
+    THROTTLING_ERROR_CODES = [
+        "Throttling",
+        "ThrottlingException",
+        "TooManyRequestsException",
+        "RequestLimitExceeded",
+    ]
+    # Error codes that only mean throttling for some operations. CloudFormation returns LimitExceededException when
+    # a quota such as the number of stacks is reached, retrying will not help.
+    OPERATION_THROTTLING_ERROR_CODES = {
+        "config.StartConfigRulesEvaluation": ["LimitExceededException"],
+    }
+
+    DEFAULT_RATE = 5
+    DEFAULT_RATES = {
+        "config.StartConfigRulesEvaluation": 1,
+        "config.DescribeConfigRuleEvaluationStatus": 1,
+        "config.BatchGetResourceConfig": 2,
+        "config.GetComplianceDetailsByConfigRule": 2,
+        "cloudformation.DescribeStacks": 2,
+        "cloudformation.DescribeStackEvents": 2,
+        "cloudtrail.LookupEvents": 2,
+    }
+
+    DEFAULT_MAX_RETRIES = 8
+    BACKOFF_BASE_SEC = 15
+    BACKOFF_MAX_SEC = 120
+
+    def __init__(self, rates=None, max_retries=DEFAULT_MAX_RETRIES):
+        self._lock = threading.Lock()
+        self.buckets = {}
+        self.configure(rates=rates, max_retries=max_retries)
+
+    def configure(self, rates=None, max_retries=None):
+        with self._lock:
+            self.rates = self.DEFAULT_RATES.copy()
+            self.rates.update(rates or {})
+            for operation, rate in self.rates.items():
+                if float(rate) <= 0:
+                    raise Exception(f"Error - Rate limit for api operation '{operation}' must be greater than 0")
+            # Buckets are recreated lazily with the new rates
+            self.buckets = {}
+            if max_retries is not None:
+                self.max_retries = max_retries
+
+    def bucket(self, operation):
+        with self._lock:
+            if operation not in self.buckets:
+                self.buckets[operation] = TokenBucket(self.rates.get(operation, self.DEFAULT_RATE))
+            return self.buckets[operation]
+
+    def register(self, client):
+        """Acquire a token before every api call made by the boto3 client, including paginators and waiters"""
+        client.meta.events.register("before-call.*.*", self._before_call)
+        return client
+
+    def _before_call(self, model, **kwargs):
+        self.bucket(f"{model.service_model.service_name}.{model.name}").acquire()
+
+    def is_throttling_error(self, operation, error_code):
+        return error_code in self.THROTTLING_ERROR_CODES or error_code in self.OPERATION_THROTTLING_ERROR_CODES.get(
+            operation, []
+        )
+
+    def call(self, operation, fn, **kwargs):
+        """Call fn, retrying with exponential backoff while the api is throttling.
+
+        Raises ThrottlingError once the retry budget is exhausted.
+        """
+        bucket = self.bucket(operation)
+        retries = 0
+        while True:
+            try:
+                response = fn(**kwargs)
+            except botocore.exceptions.ClientError as e:
+                error_code = e.response["Error"]["Code"]
+                if not self.is_throttling_error(operation, error_code):
+                    raise e
+                if retries >= self.max_retries:
+                    raise ThrottlingError(
+                        f"Error - AWS api '{operation}' is still throttled after {retries} retries. Reduce the "
+                        "number of concurrent critter runs or lower the rate with '--api-rate-limit'."
+                    ) from e
+                bucket.throttled()
+                delay = min(self.BACKOFF_BASE_SEC * 2**retries, self.BACKOFF_MAX_SEC)
+                retries += 1
+                logger.info(
+                    f"Encountered {error_code} when calling '{operation}' api, sleeping {delay} seconds before "
+                    f"retry {retries}/{self.max_retries}"
+                )
+                time.sleep(delay)
+            else:
+                bucket.succeeded()
+                return response
+
+
+class ApiCallCounter:
+    """Counts the api calls made by a single critter test per operation. Throttling retries are not counted."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self._lock = threading.Lock()
+
+    def count(self, operation):
+        with self._lock:
+            self.counts[operation] += 1
+
+    @property
+    def total(self):
+        with self._lock:
+            return sum(self.counts.values())
+
+
+# Shared by every Stack in the process so parallel tests draw from the same token buckets
+limiter = RateLimiter()
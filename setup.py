@@ -42,5 +42,7 @@ setup(
     packages=["critter"],
     python_requires=">= 3.6",
     install_requires=["boto3>=1.11"],
+    # The pytest plugin is not auto-registered, enable it with '-p critter.pytest_plugin'
+    extras_require={"pytest": ["pytest>=7.0.0"]},
     scripts=["bin/critter"],
 )
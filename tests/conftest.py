@@ -1,10 +1,14 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
 import os
 import sys
 import pytest
 
+pytest_plugins = ["pytester"]
+
 # Add '/<repo-root>/critter' to the path
 repo_root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
 sys.path.append(os.path.join(repo_root, "critter"))
@@ -25,3 +29,50 @@ def test_stacks_cw_loggroup_retention_period():
     path = os.path.join(repo_root, "examples", "test-stacks", "cw-loggroup-retention-period.yml")
     with open(path) as f:
         return f.read()
+
+
+@pytest.fixture()
+def clients():
+    # Mocked boto3 clients, pass to Stack.initialize_boto_clients()
+    return {"sts": MagicMock(), "cloudformation": MagicMock(), "config": MagicMock()}
+
+
+@pytest.fixture()
+def config_rule():
+    # Builds a described managed Config rule
+    def config_rule(name, resource_types=None, state="ACTIVE"):
+        return {
+            "ConfigRuleName": name,
+            "Scope": {"ComplianceResourceTypes": resource_types or ["AWS::EC2::SecurityGroup"]},
+            "Source": {"Owner": "AWS", "SourceIdentifier": name.upper().replace("-", "_")},
+            "ConfigRuleState": state,
+        }
+
+    return config_rule
+
+
+@pytest.fixture()
+def stack_event():
+    # Builds a CloudFormation stack event, timestamped event_id seconds after 2022-01-01
+    def stack_event(event_id, status, logical_id="TestStack", resource_type="AWS::CloudFormation::Stack", reason=None):
+        event = {
+            "EventId": event_id,
+            "Timestamp": datetime(2022, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=int(event_id)),
+            "LogicalResourceId": logical_id,
+            "ResourceType": resource_type,
+            "ResourceStatus": status,
+        }
+        if reason:
+            event["ResourceStatusReason"] = reason
+        return event
+
+    return stack_event
+
+
+@pytest.fixture()
+def list_stacks():
+    # Builds a ListStacks response page from (stack name, stack status) pairs
+    def list_stacks(*statuses):
+        return {"StackSummaries": [{"StackName": name, "StackStatus": status} for name, status in statuses]}
+
+    return list_stacks
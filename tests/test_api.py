@@ -0,0 +1,164 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock, mock_open, call
+import pytest
+
+from critter import Stack, TestResult, run_test
+from critter.run_state import RunState
+from critter.stack import ApiCallBudgetExceeded, TestFailure as CritterTestFailure
+
+PHASES = [
+    "template_config_rule_tests",
+    "preflight_check",
+    "update_rule_code",
+    "deploy",
+    "process_outputs",
+    "plan_config_rule_evaluation",
+    "check_config_rules",
+    "wait_for_config_resources",
+    "start_config_rule_evaluation",
+    "wait_for_config_evaluation",
+    "report_latency",
+    "validate_config_evaluation",
+    "delete",
+]
+
+
+@pytest.fixture(autouse=True)
+def mock_run_state():
+    with patch.object(RunState, "save") as mock_save, patch.object(RunState, "remove"):
+        yield mock_save
+
+
+def patch_phases(func):
+    for phase in PHASES:
+        func = patch.object(Stack, phase, autospec=True)(func)
+    return func
+
+
+@patch_phases
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_run_test_passed(mock_boto_client, *mock_phases):
+    clients = {"sts": MagicMock(), "config": MagicMock()}
+
+    result = run_test("./my_template.yml", capabilities=["CAPABILITY_IAM"], clients=clients)
+
+    # Only the missing client is created and it is added to the shared clients
+    assert mock_boto_client.call_args_list == [call("cloudformation")]
+    assert clients["cloudformation"] == mock_boto_client.return_value
+    assert isinstance(result, TestResult)
+    assert result.passed is True
+    assert result.error is None
+    assert result.stack_name == "Critter-my-template"
+    # Rule code is pushed for the rules known before deploying and for the rules named by the stack outputs
+    mock_update_rule_code = mock_phases[2]
+    assert mock_update_rule_code.call_count == 2
+    assert all(m.call_count == 1 for m in mock_phases if m is not mock_update_rule_code)
+
+
+@patch_phases
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_run_test_failed(
+    mock_boto_client,
+    mock_template_config_rule_tests,
+    mock_preflight_check,
+    mock_update_rule_code,
+    mock_deploy,
+    mock_process_outputs,
+    mock_plan_config_rule_evaluation,
+    mock_check_config_rules,
+    mock_wait_for_config_resources,
+    mock_start_config_rule_evaluation,
+    mock_wait_for_config_evaluation,
+    mock_report_latency,
+    mock_validate_config_evaluation,
+    mock_delete,
+):
+    resources = {
+        "compliant-one": {
+            "expected_compliance_type": "COMPLIANT",
+            "evaluation_result": {"ComplianceType": "COMPLIANT"},
+        },
+        "compliant-two": {
+            "expected_compliance_type": "COMPLIANT",
+            "evaluation_result": {"ComplianceType": "NON_COMPLIANT"},
+        },
+    }
+
+    def validate(self):
+        self.resources = resources
+        raise CritterTestFailure("Failed resource ids: ['compliant-two']")
+
+    mock_validate_config_evaluation.side_effect = validate
+
+    result = run_test("./template.yml", delete_stack="Always")
+
+    assert result.passed is False
+    assert isinstance(result.error, CritterTestFailure)
+    assert result.failed_resource_ids == ["compliant-two"]
+    assert mock_delete.call_count == 1
+    # Latency is still reported when validation fails
+    assert mock_report_latency.call_count == 1
+
+
+@patch_phases
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_run_test_api_call_budget(mock_boto_client, *mock_phases):
+    clients = {"sts": MagicMock(), "cloudformation": MagicMock(), "config": MagicMock()}
+
+    # GetCallerIdentity and the DescribeStackEvents read of the last stack event
+    assert run_test("./template.yml", max_api_calls=2, clients=clients).passed is True
+
+    result = run_test("./template.yml", max_api_calls=1, clients=clients)
+    assert result.passed is False
+    assert isinstance(result.error, ApiCallBudgetExceeded)
+    assert "made 2 AWS api calls, more than the budget of 1" in str(result.error)
+    assert "'cloudformation.DescribeStackEvents': 1" in str(result.error)
+    # Like any other failed test, the stack is kept with the default delete policy
+    assert mock_phases[-1].call_count == 1
+
+
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_stack_test_exits_on_failure(mock_boto_client):
+    stack = Stack()
+    stack.configure("./template.yml")
+    stack.initialize_boto_clients()
+
+    with patch.object(Stack, "run", return_value=TestResult("Critter-template", error=Exception("boom"))):
+        with pytest.raises(SystemExit):
+            stack.test()
+
+
+@patch_phases
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_run_test_interrupted(mock_boto_client, *mock_phases):
+    mock_deploy, mock_delete = mock_phases[3], mock_phases[-1]
+    mock_deploy.side_effect = KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run_test("./template.yml", delete_stack="Always")
+    # The stack is cleaned up before the interrupt is re-raised
+    assert mock_delete.call_count == 1
+
+    with patch.object(Stack, "run", side_effect=KeyboardInterrupt):
+        with pytest.raises(SystemExit):
+            stack = Stack()
+            stack.configure("./template.yml")
+            stack.test()
+
+
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_run_test_on_deploy_failure(mock_boto_client):
+    with patch.object(Stack, "run", autospec=True, side_effect=lambda stack: stack.on_deploy_failure):
+        assert run_test("./template.yml") == Stack.ON_DEPLOY_FAILURE_DELETE
+        assert run_test("./template.yml", on_deploy_failure="Keep") == Stack.ON_DEPLOY_FAILURE_KEEP
+
+    with pytest.raises(Exception, match="on_deploy_failure must be one of"):
+        run_test("./template.yml", on_deploy_failure="Retain")
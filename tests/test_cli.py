@@ -45,3 +45,18 @@ def test_cli(mock_boto_client):
     assert stack2.stack_tags == [{"Key": "ConfigRuleTesting", "Value": "True"}, {"Key": "Critter", "Value": "True"}]
     assert stack2.cfn_capabilities == ["CAPABILITY_IAM"]
     assert stack2.trigger_rule_evaluation is False
+    assert stack2.run_state.path == ".critter/CustomStackName.json"
+    assert stack2.resume is False
+
+
+@patch("boto3.client")
+def test_cli_resume(mock_boto_client, tmp_path):
+    template = tmp_path / "template.yml"
+    template.write_text("Resources: {}")
+    run_state_file = tmp_path / "state.json"
+    run_state_file.write_text("{}")
+
+    stack = Stack()
+    stack.parse_args([str(template), "--resume", "--run-state", str(run_state_file)])
+    assert stack.resume is True
+    assert stack.run_state.path == str(run_state_file)
@@ -0,0 +1,108 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock, call
+import pytest
+
+from critter import FixtureStacks, Stack, TestResult
+
+
+@pytest.fixture()
+def templates(tmp_path):
+    paths = []
+    for name in ["vpc_fixture", "kms-fixture", "test-stack"]:
+        path = tmp_path / f"{name}.yml"
+        path.write_text(f"# {name}")
+        paths.append(str(path))
+    return paths
+
+
+outputs = {
+    "Critter-fixture-vpc-fixture": {"VpcId": "vpc-111", "SubnetId": "subnet-111"},
+    "Critter-fixture-kms-fixture": {"KmsKeyArn": "arn:aws:kms:us-region-1:111111111111:key/aaa"},
+}
+
+
+def patch_fixture_stacks(func):
+    func = patch.object(Stack, "deploy", autospec=True)(func)
+    func = patch.object(Stack, "get_stack_outputs", autospec=True, side_effect=lambda s: outputs[s.stack_name])(func)
+    return patch.object(Stack, "delete", autospec=True)(func)
+
+
+@patch_fixture_stacks
+def test_fixture_stacks(mock_deploy, mock_get_stack_outputs, mock_delete, templates):
+    clients = {"sts": MagicMock(), "cloudformation": MagicMock(), "config": MagicMock()}
+    fixtures = FixtureStacks(templates[:2], clients=clients, delete_stack="OnSuccess")
+
+    assert fixtures.deploy() == {**outputs["Critter-fixture-vpc-fixture"], **outputs["Critter-fixture-kms-fixture"]}
+    # Later tests reuse the deployed fixture stacks
+    fixtures.deploy()
+    assert [c.args[0].stack_name for c in mock_deploy.call_args_list] == [
+        "Critter-fixture-vpc-fixture",
+        "Critter-fixture-kms-fixture",
+    ]
+    assert all(s.cfn is clients["cloudformation"] for s in fixtures.stacks)
+
+    fixtures.teardown(passed=False)
+    assert mock_delete.call_count == 0
+
+    fixtures.deployed = list(fixtures.stacks)
+    fixtures.teardown(passed=True)
+    # Fixture stacks are deleted in reverse order so later fixtures can import exports of earlier ones
+    assert [c.args[0].stack_name for c in mock_delete.call_args_list] == [
+        "Critter-fixture-kms-fixture",
+        "Critter-fixture-vpc-fixture",
+    ]
+
+
+@patch_fixture_stacks
+def test_fixture_stacks_deploy_failed(mock_deploy, mock_get_stack_outputs, mock_delete, templates):
+    fixtures = FixtureStacks(templates[:2], clients={"sts": MagicMock(), "cloudformation": MagicMock(), "config": 1})
+    mock_deploy.side_effect = [None, Exception("boom")]
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="boom"):
+            fixtures.deploy()
+    # The failure is reported to every test without deploying again
+    assert mock_deploy.call_count == 2
+
+    fixtures.teardown(passed=False)
+    assert mock_delete.call_count == 0
+
+
+@patch("boto3.client")
+def test_stack_get_template_parameters(mock_boto_client):
+    stack = Stack()
+    stack.initialize_boto_clients()
+    stack.template_location = {"TemplateBody": "template body"}
+    assert stack.get_template_parameters() == {}
+
+    stack.fixture_outputs = {"VpcId": "vpc-111", "KmsKeyArn": "arn:aws:kms:us-region-1:111111111111:key/aaa"}
+    stack.cfn = MagicMock()
+    stack.cfn.get_template_summary.return_value = {
+        "Parameters": [{"ParameterKey": "VpcId"}, {"ParameterKey": "RetentionInDays"}]
+    }
+
+    # Only the parameters declared by the test template are passed
+    assert stack.get_template_parameters() == {"Parameters": [{"ParameterKey": "VpcId", "ParameterValue": "vpc-111"}]}
+    assert stack.cfn.get_template_summary.call_args_list == [call(TemplateBody="template body")]
+
+
+@patch_fixture_stacks
+@patch("boto3.client")
+def test_stack_test_with_fixtures(mock_boto_client, mock_deploy, mock_get_stack_outputs, mock_delete, templates):
+    stack = Stack()
+    stack.parse_args([templates[2], "--fixture", templates[0], "--delete-stack", "Always"])
+    stack.initialize_boto_clients()
+    fixture_outputs = []
+
+    def run(self):
+        fixture_outputs.append(self.fixture_outputs)
+        return TestResult(self.stack_name, error=Exception("boom"))
+
+    with patch.object(Stack, "run", autospec=True, side_effect=run):
+        with pytest.raises(SystemExit):
+            stack.test()
+
+    assert fixture_outputs == [outputs["Critter-fixture-vpc-fixture"]]
+    assert [c.args[0].stack_name for c in mock_delete.call_args_list] == ["Critter-fixture-vpc-fixture"]
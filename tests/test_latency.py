@@ -0,0 +1,118 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime, timedelta, timezone
+import json
+import pytest
+
+from critter import Stack
+from critter.latency import LatencyHistory, LatencyReport, percentile
+
+t0 = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+
+def resource_timestamps(recording, invocation, evaluation):
+    capture = t0 + timedelta(seconds=recording)
+    invoked = capture + timedelta(seconds=invocation)
+    return {
+        "last_stack_event_timestamp": t0,
+        "configuration_item_capture_time": capture,
+        "config_rule_invoked_time": invoked,
+        "result_recorded_time": invoked + timedelta(seconds=evaluation),
+    }
+
+
+def test_percentile():
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 90) == 9
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 100) == 10
+    assert percentile([5], 50) == 5
+
+
+def test_latency_report():
+    report = LatencyReport(
+        "my-config-rule",
+        [
+            resource_timestamps(30, 5, 1),
+            resource_timestamps(60, 10, 2),
+            # Configuration item capture time is unknown when waiting for resource recording is skipped
+            {**resource_timestamps(90, 15, 3), "configuration_item_capture_time": None},
+        ],
+    )
+
+    assert report.percentiles() == {
+        "recording": {"p50": 30.0, "p90": 60.0, "p100": 60.0},
+        "invocation": {"p50": 5.0, "p90": 10.0, "p100": 10.0},
+        "evaluation": {"p50": 2.0, "p90": 3.0, "p100": 3.0},
+        "total": {"p50": 72.0, "p90": 108.0, "p100": 108.0},
+    }
+
+
+def test_latency_history(tmp_path):
+    history = LatencyHistory(str(tmp_path / "history" / "latency.jsonl"))
+    fast = LatencyReport("my-config-rule", [resource_timestamps(30, 5, 1)])
+    slow = LatencyReport("my-config-rule", [resource_timestamps(30, 5, 60)])
+
+    for _ in range(LatencyHistory.MIN_HISTORY):
+        assert history.regressions(slow) == []
+        history.append(fast, "MyStack")
+    history.append(LatencyReport("other-config-rule", [resource_timestamps(30, 5, 60)]), "OtherStack")
+
+    assert len(history.load("my-config-rule")) == LatencyHistory.MIN_HISTORY
+    assert history.regressions(fast) == []
+    assert history.regressions(slow) == [
+        "evaluation p90 60.0s is more than 2x the median of 3 previous runs (1.0s)",
+        "total p90 95.0s is more than 2x the median of 3 previous runs (36.0s)",
+    ]
+
+
+@pytest.fixture()
+def stack(clients):
+    timestamps = resource_timestamps(30, 5, 1)
+    stack = Stack()
+    stack.initialize_boto_clients(clients)
+    stack.stack_name = "MyStack"
+    stack.config_rule_name = "my-config-rule"
+    stack.last_stack_event_timestamp = t0
+    stack.resources = {
+        "compliant-one": {
+            "expected_compliance_type": "COMPLIANT",
+            "configuration_item_capture_time": timestamps["configuration_item_capture_time"],
+            "evaluation_result": {
+                "ComplianceType": "COMPLIANT",
+                "ConfigRuleInvokedTime": timestamps["config_rule_invoked_time"],
+                "ResultRecordedTime": timestamps["result_recorded_time"],
+            },
+        },
+    }
+    return stack
+
+
+def test_stack_report_latency(stack, tmp_path, caplog):
+    caplog.set_level("INFO")
+    stack.latency_history = str(tmp_path / "latency.jsonl")
+
+    stack.report_latency()
+
+    assert "Config rule 'my-config-rule' evaluation latency (seconds):" in caplog.text
+    assert "total:       p50=36.0  p90=36.0  p100=36.0" in caplog.text
+    with open(stack.latency_history) as f:
+        entry = json.loads(f.read())
+    assert entry["config_rule_name"] == "my-config-rule"
+    assert entry["stack_name"] == "MyStack"
+    assert entry["latency"]["total"] == {"p50": 36.0, "p90": 36.0, "p100": 36.0}
+
+
+def test_stack_report_latency_history_errors(stack, tmp_path, caplog):
+    # A corrupt history is reported but the new entry is still recorded
+    history_file = tmp_path / "latency.jsonl"
+    history_file.write_text('{"config_rule_name": "my-config-rule"}\nnot json\n')
+    stack.latency_history = str(history_file)
+    stack.report_latency()
+    assert f"Warning - Unable to read latency history '{history_file}'" in caplog.text
+    assert len(history_file.read_text().splitlines()) == 3
+
+    # An unwritable history never fails the test
+    stack.latency_history = str(tmp_path)
+    stack.report_latency()
+    assert f"Warning - Unable to write latency history '{tmp_path}'" in caplog.text
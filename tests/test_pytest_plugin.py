@@ -0,0 +1,118 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, call
+import pytest
+
+from critter import FixtureStacks, TestResult
+from critter.pytest_plugin import stack_name_from_path
+from critter.stack import TestFailure as CritterTestFailure
+
+
+def run_pytester(pytester, *args):
+    test_stacks = pytester.mkdir("test-stacks")
+    for name in ["test-stack-one", "test-stack-two"]:
+        (test_stacks / f"{name}.yml").write_text("Resources: {}")
+    (test_stacks / "notes.txt").write_text("not a template")
+    # Other yaml files in the project are not test templates
+    pytester.makefile(".yml", **{"docker-compose": "services: {}"})
+    return pytester.runpytest("-p", "critter.pytest_plugin", *args)
+
+
+def test_plugin_disabled_by_default(pytester):
+    result = run_pytester(pytester)
+    result.assert_outcomes()
+
+
+def test_plugin_collects_templates(pytester):
+    results = {
+        "test-stack-one": TestResult("Critter-test-stack-one", config_rule_name="my-config-rule"),
+        "test-stack-two": TestResult(
+            "Critter-test-stack-two",
+            config_rule_name="my-config-rule",
+            resources={
+                "sg-111": {
+                    "expected_compliance_type": "COMPLIANT",
+                    "evaluation_result": {"ComplianceType": "COMPLIANT"},
+                },
+                "sg-222": {
+                    "expected_compliance_type": "COMPLIANT",
+                    "evaluation_result": {"ComplianceType": "NON_COMPLIANT"},
+                },
+            },
+            error=CritterTestFailure("Failed resource ids: ['sg-222']"),
+        ),
+    }
+    calls = []
+
+    def run_test(template_file, **kwargs):
+        calls.append(kwargs)
+        return results[template_file.stem]
+
+    with patch("critter.api.run_test", side_effect=run_test):
+        result = run_pytester(
+            pytester,
+            "--critter",
+            "--critter-testpath",
+            "test-stacks",
+            "--critter-capabilities",
+            "CAPABILITY_IAM",
+            "--critter-on-deploy-failure",
+            "Keep",
+        )
+
+    result.assert_outcomes(passed=1, failed=1)
+    result.stdout.fnmatch_lines(["*sg-222: expected COMPLIANT, actual NON_COMPLIANT*"])
+    assert [c["capabilities"] for c in calls] == [["CAPABILITY_IAM"], ["CAPABILITY_IAM"]]
+    assert [c["delete_stack"] for c in calls] == ["OnSuccess", "OnSuccess"]
+    assert [c["on_deploy_failure"] for c in calls] == ["Keep", "Keep"]
+    assert [c["stack_name"] for c in calls] == [
+        "Critter-test-stacks-test-stack-one",
+        "Critter-test-stacks-test-stack-two",
+    ]
+    # Every test in the session shares the same clients
+    assert calls[0]["clients"] is calls[1]["clients"]
+
+
+def test_plugin_requires_testpaths(pytester):
+    result = run_pytester(pytester, "--critter")
+    assert result.ret == pytest.ExitCode.USAGE_ERROR
+    result.stderr.fnmatch_lines(["*'--critter-testpath' or the 'critter_testpaths' ini option*"])
+
+
+def test_plugin_ini_testpaths(pytester):
+    pytester.makeini("[pytest]\ncritter_testpaths = test-stacks/\n")
+
+    with patch("critter.api.run_test", return_value=TestResult("Critter-stack")):
+        result = run_pytester(pytester, "--critter", "--collect-only", "-q")
+
+    result.stdout.fnmatch_lines(["test-stacks/test-stack-one.yml::test-stack-one", "*2 tests collected*"])
+    assert "docker-compose" not in result.stdout.str()
+
+
+def test_stack_name_from_path(tmp_path):
+    template = tmp_path / "rules" / "s3_bucket" / "public read.yaml"
+    assert stack_name_from_path(template, tmp_path) == "Critter-rules-s3-bucket-public-read"
+
+
+def test_plugin_fixture_stacks(pytester):
+    (pytester.mkdir("fixtures") / "vpc.yml").write_text("Resources: {}")
+    calls = []
+
+    def run_test(template_file, **kwargs):
+        calls.append(kwargs)
+        return TestResult(kwargs["stack_name"], error=None if template_file.stem.endswith("one") else Exception())
+
+    with patch("critter.api.run_test", side_effect=run_test), patch.object(
+        FixtureStacks, "deploy", autospec=True, return_value={"VpcId": "vpc-111"}
+    ) as mock_deploy, patch.object(FixtureStacks, "teardown", autospec=True) as mock_teardown:
+        result = run_pytester(
+            pytester, "--critter", "--critter-testpath", "test-stacks", "--critter-fixture", "fixtures/vpc.yml"
+        )
+
+    result.assert_outcomes(passed=1, failed=1)
+    assert [c["fixture_outputs"] for c in calls] == [{"VpcId": "vpc-111"}] * 2
+    fixtures = mock_deploy.call_args_list[0].args[0]
+    assert [s.stack_name for s in fixtures.stacks] == ["Critter-fixture-fixtures-vpc"]
+    # The fixture stacks are torn down once, knowing a test that used them failed
+    assert mock_teardown.call_args_list == [call(fixtures, False)]
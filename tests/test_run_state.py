@@ -0,0 +1,176 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+import pytest
+
+from critter import Stack
+from critter.run_state import RunState
+
+t0 = datetime(2022, 1, 1, tzinfo=timezone.utc)
+stack_id = "arn:aws:cloudformation:us-region-1:111111111111:stack/Critter-template/aaa111"
+
+
+def test_run_state_round_trip(tmp_path):
+    run_state = RunState(str(tmp_path / ".critter" / "Critter-template.json"))
+    assert not run_state.exists()
+
+    run_state.save({"phase": "deploy", "resources": {"sg-111": {"evaluation_result": {"ResultRecordedTime": t0}}}})
+    state = run_state.load()
+    assert state["phase"] == "deploy"
+    assert state["resources"]["sg-111"]["evaluation_result"]["ResultRecordedTime"] == t0
+    # Only the state file is left behind
+    assert [p.name for p in (tmp_path / ".critter").iterdir()] == ["Critter-template.json"]
+
+    run_state.remove()
+    assert not run_state.exists()
+
+
+def test_run_state_datetimes(tmp_path):
+    run_state = RunState(str(tmp_path / "state.json"))
+    timestamps = [t0, datetime(2022, 1, 1, 1, 2, 3, 456789), datetime(2022, 1, 1, tzinfo=timezone(timedelta(hours=-5)))]
+
+    run_state.save({"timestamps": timestamps})
+
+    # Timestamps with and without a UTC offset are restored
+    assert run_state.load()["timestamps"] == timestamps
+
+
+def test_run_state_version_mismatch(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text('{"version": 0}')
+
+    with pytest.raises(Exception, match="incompatible critter version"):
+        RunState(str(path)).load()
+
+
+@pytest.fixture()
+def configure_stack(tmp_path):
+    # Configures a new Stack for the test template, a resumed run is configured again with resume=True
+    def configure_stack(resume=False):
+        template = tmp_path / "template.yml"
+        if not template.exists():
+            template.write_text("Resources: {}")
+        stack = Stack()
+        stack.configure(str(template), run_state_file=str(tmp_path / "state.json"), resume=resume, skip_preflight=True)
+        stack.initialize_boto_clients({"sts": MagicMock(), "cloudformation": MagicMock(), "config": MagicMock()})
+        stack.cfn.describe_stack_events.return_value = {"StackEvents": [{"Timestamp": t0}]}
+        return stack
+
+    return configure_stack
+
+
+def deploy(self):
+    self.stack_id = stack_id
+    self.deploy_action_performed = "CREATE"
+
+
+def process_outputs(self):
+    self.stack_outputs = {"ConfigRuleName": "my-config-rule"}
+    self.config_rule_name = "my-config-rule"
+    self.config_rule = {"ConfigRuleName": "my-config-rule"}
+    self.resource_types = ["AWS::EC2::SecurityGroup"]
+    self.resources = {
+        r_id: {"expected_compliance_type": "COMPLIANT", "evaluation_result": {}} for r_id in ["sg-111", "sg-222"]
+    }
+
+
+def evaluation_result(r_id):
+    return {
+        "EvaluationResultIdentifier": {
+            "EvaluationResultQualifier": {"ResourceId": r_id, "ResourceType": "AWS::EC2::SecurityGroup"}
+        },
+        "ComplianceType": "COMPLIANT",
+        "ResultRecordedTime": t0,
+    }
+
+
+def interrupted_evaluation(self):
+    # One resource was evaluated before the CI job was cancelled
+    self.resources["sg-111"]["resource_type"] = "AWS::EC2::SecurityGroup"
+    self.resources["sg-111"]["evaluation_result"] = evaluation_result("sg-111")
+    raise KeyboardInterrupt
+
+
+def resumed_evaluation(self):
+    assert self.resources["sg-111"]["evaluation_result"]["ResultRecordedTime"] == t0
+    self.resources["sg-222"]["resource_type"] = "AWS::EC2::SecurityGroup"
+    self.resources["sg-222"]["evaluation_result"] = evaluation_result("sg-222")
+
+
+@patch.object(Stack, "wait_for_config_resources", autospec=True)
+@patch.object(Stack, "plan_config_rule_evaluation", autospec=True)
+@patch.object(Stack, "process_outputs", autospec=True, side_effect=process_outputs)
+@patch.object(Stack, "deploy", autospec=True, side_effect=deploy)
+def test_stack_resume(mock_deploy, mock_process_outputs, mock_plan, mock_wait_for_config_resources, configure_stack):
+    stack = configure_stack()
+    stack.evaluation_strategy = Stack.EVALUATION_STRATEGY_TRIGGER
+    with patch.object(Stack, "wait_for_config_evaluation", autospec=True, side_effect=interrupted_evaluation):
+        with pytest.raises(KeyboardInterrupt):
+            stack.run()
+
+    state = stack.run_state.load()
+    assert state["phase"] == "start_config_rule_evaluation"
+    assert state["stack_id"] == stack_id
+    [rule_test_state] = state["config_rule_tests"]
+    assert rule_test_state["evaluation_triggered_time"] is not None
+    assert rule_test_state["resources"]["sg-111"]["evaluation_result"]["ComplianceType"] == "COMPLIANT"
+    assert stack.config.start_config_rules_evaluation.call_count == 1
+
+    stack = configure_stack(resume=True)
+    stack.cfn.describe_stacks.return_value = {"Stacks": [{"StackId": stack_id, "StackStatus": "CREATE_COMPLETE"}]}
+    with patch.object(Stack, "wait_for_config_evaluation", autospec=True, side_effect=resumed_evaluation), patch.object(
+        Stack, "delete", autospec=True
+    ):
+        result = stack.run()
+
+    assert result.passed is True
+    assert result.config_rule_name == "my-config-rule"
+    # The resumed run does not redeploy, reprocess the outputs or re-trigger the evaluation
+    assert mock_deploy.call_count == 1
+    assert mock_process_outputs.call_count == 1
+    assert mock_wait_for_config_resources.call_count == 1
+    stack.config.start_config_rules_evaluation.assert_not_called()
+    assert not stack.run_state.exists()
+
+
+@patch.object(Stack, "delete", autospec=True)
+@patch.object(Stack, "wait_for_config_resources", autospec=True)
+@patch.object(Stack, "plan_config_rule_evaluation", autospec=True)
+@patch.object(Stack, "process_outputs", autospec=True, side_effect=process_outputs)
+@patch.object(Stack, "deploy", autospec=True, side_effect=deploy)
+def test_stack_interrupted_stack_deleted(
+    mock_deploy, mock_process_outputs, mock_plan, mock_wait_for_config_resources, mock_delete, configure_stack, caplog
+):
+    stack = configure_stack()
+    stack.delete_stack = Stack.DELETE_STACK_ALWAYS
+    stack.evaluation_strategy = Stack.EVALUATION_STRATEGY_TRIGGER
+    with patch.object(Stack, "wait_for_config_evaluation", autospec=True, side_effect=interrupted_evaluation):
+        with pytest.raises(KeyboardInterrupt):
+            stack.run()
+
+    # A deleted stack can not be resumed, so no resume hint is given
+    assert mock_delete.call_count == 1
+    assert not stack.run_state.exists()
+    assert "--resume" not in caplog.text
+
+
+@patch("boto3.client")
+def test_stack_resume_errors(mock_boto_client, configure_stack, tmp_path):
+    with pytest.raises(Exception, match="Cannot resume, run state file .* not found"):
+        configure_stack(resume=True)
+
+    stack = configure_stack()
+    stack.stack_id = stack_id
+    stack.checkpoint("deploy")
+
+    stack = configure_stack(resume=True)
+    stack.cfn.describe_stacks.return_value = {"Stacks": [{"StackId": "other", "StackStatus": "CREATE_COMPLETE"}]}
+    with pytest.raises(Exception, match="from the interrupted run is no longer deployed"):
+        stack.restore_run_state()
+
+    (tmp_path / "template.yml").write_text("Resources: {Changed: {}}")
+    stack = configure_stack(resume=True)
+    with pytest.raises(Exception, match="changed since the interrupted run"):
+        stack.restore_run_state()
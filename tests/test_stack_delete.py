@@ -0,0 +1,59 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock, call
+import pytest
+
+from critter import Stack
+from critter.status_poller import StackStatusPoller
+
+
+@patch.object(StackStatusPoller, "POLL_INTERVAL_SEC", 0)
+@patch("boto3.client")
+def test_stack_delete_polls_until_stack_is_gone(mock_boto_client, list_stacks):
+    stack = Stack()
+    stack.stack_name = "Critter-template"
+    stack.initialize_boto_clients()
+    stack.cfn = MagicMock()
+    stack.cfn.list_stacks.side_effect = [
+        list_stacks(("Critter-template", "DELETE_IN_PROGRESS"), ("Other", "CREATE_COMPLETE")),
+        # Deleted stacks are filtered out of the results
+        list_stacks(("Other", "CREATE_COMPLETE")),
+    ]
+
+    stack.delete()
+
+    assert stack.cfn.delete_stack.call_args_list == [call(StackName="Critter-template")]
+    assert stack.cfn.list_stacks.call_count == 2
+    stack.cfn.describe_stacks.assert_not_called()
+    stack.cfn.get_waiter.assert_not_called()
+
+
+@patch("boto3.client")
+def test_stack_delete_failed(mock_boto_client, list_stacks):
+    stack = Stack()
+    stack.stack_name = "Critter-template"
+    stack.initialize_boto_clients()
+    stack.cfn = MagicMock()
+    stack.cfn.list_stacks.return_value = list_stacks(("Critter-template", "DELETE_FAILED"))
+
+    with pytest.raises(Exception, match="delete failed"):
+        stack.delete()
+
+
+@patch("boto3.client")
+def test_stack_get_compliance_details_pages(mock_boto_client):
+    stack = Stack()
+    stack.config_rule_name = "my-config-rule"
+    stack.initialize_boto_clients()
+    stack.config = MagicMock()
+    stack.config.get_compliance_details_by_config_rule.side_effect = [
+        {"EvaluationResults": [{"id": 1}], "NextToken": "token"},
+        {"EvaluationResults": [{"id": 2}]},
+    ]
+
+    assert list(stack.get_compliance_details()) == [{"id": 1}, {"id": 2}]
+    assert stack.config.get_compliance_details_by_config_rule.call_args_list == [
+        call(ConfigRuleName="my-config-rule"),
+        call(ConfigRuleName="my-config-rule", NextToken="token"),
+    ]
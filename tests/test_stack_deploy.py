@@ -1,15 +1,20 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: Apache-2.0
 
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, MagicMock, call
 from botocore.exceptions import ClientError
 
 from critter import Stack
+from critter.status_poller import StackStatusPoller
 
+t0 = datetime(2022, 1, 1, tzinfo=timezone.utc)
+stack_id = "arn:aws:cloudformation:us-region-1:111111111111:stack/TestStack/aaa111"
 
-@patch("boto3.resource")
+
+@patch.object(StackStatusPoller, "POLL_INTERVAL_SEC", 0)
 @patch("boto3.client")
-def test_stack_deploy_create(mock_boto_client, mock_boto_resource, test_stacks_cw_loggroup_retention_period):
+def test_stack_deploy_create(mock_boto_client, test_stacks_cw_loggroup_retention_period, stack_event):
     stack = Stack()
     stack.initialize_boto_clients()
     stack.template_file = "./template.yml"
@@ -19,15 +24,30 @@ def test_stack_deploy_create(mock_boto_client, mock_boto_resource, test_stacks_c
     stack.stack_tags = [{"Key": "TagKey", "Value": "TagValue"}]
 
     stack.cfn = MagicMock()
-    stack_resource = MagicMock()
-    mock_boto_resource.return_value.Stack.return_value = stack_resource
+    stack.cfn.list_stacks.return_value = {
+        "StackSummaries": [{"StackName": "TestStack", "StackStatus": "CREATE_COMPLETE"}]
+    }
+    stack.cfn.describe_stack_events.return_value = {
+        "StackEvents": [
+            stack_event("3", "CREATE_COMPLETE"),
+            stack_event("2", "CREATE_COMPLETE", "LogGroup", "AWS::Logs::LogGroup"),
+            stack_event("1", "CREATE_IN_PROGRESS"),
+        ]
+    }
+    stack.cfn.describe_stacks.return_value = {
+        "Stacks": [
+            {"StackId": stack_id, "StackStatus": "CREATE_COMPLETE", "Outputs": [{"OutputKey": "K", "OutputValue": "V"}]}
+        ]
+    }
 
     stack.deploy()
 
     assert mock_boto_client.call_args_list == [call("sts"), call("cloudformation"), call("config")]
-    assert mock_boto_resource.call_args_list == [call("cloudformation")]
-    assert mock_boto_resource.return_value.Stack.call_args_list == [call("TestStack")]
-    assert stack.stack == stack_resource
+    # One DescribeStacks snapshot provides the stack id and the outputs
+    assert stack.cfn.describe_stacks.call_args_list == [call(StackName="TestStack")]
+    assert stack.stack_id == stack_id
+    assert stack.get_stack_outputs() == {"K": "V"}
+    assert stack.cfn.describe_stacks.call_count == 1
     assert stack.cfn.create_stack.call_args_list == [
         call(
             StackName="TestStack",
@@ -37,13 +57,16 @@ def test_stack_deploy_create(mock_boto_client, mock_boto_resource, test_stacks_c
             Tags=[{"Key": "TagKey", "Value": "TagValue"}],
         )
     ]
-    assert stack.cfn.get_waiter.call_args_list == [call("stack_create_complete")]
+    assert stack.cfn.describe_stack_events.call_args_list == [call(StackName="TestStack")]
+    assert stack.cfn.get_waiter.call_args_list == []
     assert stack.deploy_action_performed == "CREATE"
+    # The last stack event timestamp is taken from the tailed events
+    assert stack.last_stack_event_timestamp == t0 + timedelta(seconds=3)
 
 
-@patch("boto3.resource")
+@patch.object(StackStatusPoller, "POLL_INTERVAL_SEC", 0)
 @patch("boto3.client")
-def test_stack_deploy_update(mock_boto_client, mock_boto_resource, test_stacks_cw_loggroup_retention_period, caplog):
+def test_stack_deploy_update(mock_boto_client, test_stacks_cw_loggroup_retention_period, stack_event, caplog):
     stack = Stack()
     stack.initialize_boto_clients()
     stack.template_file = "./template.yml"
@@ -55,15 +78,27 @@ def test_stack_deploy_update(mock_boto_client, mock_boto_resource, test_stacks_c
 
     stack.cfn = MagicMock()
     stack.cfn.create_stack.side_effect = ClientError({"Error": {"Code": "AlreadyExistsException"}}, "CreateStack")
-    stack_resource = MagicMock()
-    mock_boto_resource.return_value.Stack.return_value = stack_resource
+    stack.cfn.list_stacks.return_value = {
+        "StackSummaries": [{"StackName": "TestStack", "StackStatus": "UPDATE_COMPLETE"}]
+    }
+    stack.cfn.describe_stack_events.side_effect = [
+        {"StackEvents": [stack_event("1", "CREATE_COMPLETE")]},
+        {"StackEvents": [stack_event("2", "UPDATE_COMPLETE"), stack_event("1", "CREATE_COMPLETE")]},
+    ]
+    stack.cfn.describe_stacks.return_value = {
+        "Stacks": [
+            {"StackId": stack_id, "StackStatus": "CREATE_COMPLETE", "Outputs": [{"OutputKey": "K", "OutputValue": "V"}]}
+        ]
+    }
 
     stack.deploy()
 
     assert mock_boto_client.call_args_list == [call("sts"), call("cloudformation"), call("config")]
-    assert mock_boto_resource.call_args_list == [call("cloudformation")]
-    assert mock_boto_resource.return_value.Stack.call_args_list == [call("TestStack")]
-    assert stack.stack == stack_resource
+    # One DescribeStacks snapshot provides the stack id and the outputs
+    assert stack.cfn.describe_stacks.call_args_list == [call(StackName="TestStack")]
+    assert stack.stack_id == stack_id
+    assert stack.get_stack_outputs() == {"K": "V"}
+    assert stack.cfn.describe_stacks.call_count == 1
     assert stack.cfn.create_stack.call_args_list == [
         call(
             StackName="TestStack",
@@ -82,14 +117,14 @@ def test_stack_deploy_update(mock_boto_client, mock_boto_resource, test_stacks_c
             Tags=[{"Key": "TagKey", "Value": "TagValue"}],
         )
     ]
-    assert stack.cfn.get_waiter.call_args_list == [call("stack_update_complete")]
+    assert stack.cfn.describe_stack_events.call_args_list == [call(StackName="TestStack")] * 2
+    assert stack.cfn.get_waiter.call_args_list == []
     assert stack.deploy_action_performed == "UPDATE"
+    assert stack.last_stack_event_timestamp == t0 + timedelta(seconds=2)
     assert (
         "Warning - Updating existing CloudFormation stack 'TestStack'. Testing using existing stacks may "
         "result in unreliable test results. It is recommended to deploy a new stack for each test iteration."
         in caplog.text
     )
-    assert (
-        "Warning - Updating an existing CloudFormation stack without specifying '--trigger-rule-evaluation' may "
-        "result in the Config rule evaluation never occurring." in caplog.text
-    )
+    # The evaluation planner triggers evaluation for existing stacks, so no warning is needed
+    assert "may result in the Config rule evaluation never occurring" not in caplog.text
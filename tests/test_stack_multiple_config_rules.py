@@ -0,0 +1,175 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock, call
+import pytest
+
+from critter import Stack
+from critter.stack import TestFailure as CritterTestFailure
+
+
+@pytest.fixture()
+def stack(clients, config_rule):
+    rules = {name: config_rule(name, ["AWS::Logs::LogGroup"]) for name in ["retention-rule", "encryption-rule"]}
+    stack = Stack()
+    stack.initialize_boto_clients(clients)
+    stack.stack_name = "MyStack"
+    stack.deploy_action_performed = "CREATE"
+    stack.config.describe_config_rules.side_effect = lambda ConfigRuleNames: {
+        "ConfigRules": [rules[ConfigRuleNames[0]]]
+    }
+    return stack
+
+
+@patch("time.sleep")
+def test_stack_process_outputs_multiple_config_rules(mock_time_sleep, stack):
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "RetentionConfigRuleName", "OutputValue": "retention-rule"},
+            {"OutputKey": "RetentionCompliantResourceIds", "OutputValue": "log-group-one"},
+            {"OutputKey": "RetentionNonCompliantResourceIds", "OutputValue": "log-group-two"},
+            {"OutputKey": "EncryptionConfigRuleName", "OutputValue": "encryption-rule"},
+            {"OutputKey": "EncryptionCompliantResourceIds", "OutputValue": "log-group-two"},
+            {"OutputKey": "EncryptionNonCompliantResourceIds", "OutputValue": "log-group-one,log-group-three"},
+            {"OutputKey": "SkipWaitForResourceRecording", "OutputValue": "True"},
+        ]
+    }
+
+    stack.process_outputs()
+
+    rule_tests = stack.get_config_rule_tests()
+    assert [t.output_prefix for t in rule_tests] == ["Encryption", "Retention"]
+    assert [t.config_rule_name for t in rule_tests] == ["encryption-rule", "retention-rule"]
+    assert stack.config_rule_name == "encryption-rule, retention-rule"
+    assert rule_tests[0].resources == {
+        "log-group-two": {"evaluation_result": {}, "expected_compliance_type": "COMPLIANT"},
+        "log-group-one": {"evaluation_result": {}, "expected_compliance_type": "NON_COMPLIANT"},
+        "log-group-three": {"evaluation_result": {}, "expected_compliance_type": "NON_COMPLIANT"},
+    }
+    assert rule_tests[1].resources == {
+        "log-group-one": {"evaluation_result": {}, "expected_compliance_type": "COMPLIANT"},
+        "log-group-two": {"evaluation_result": {}, "expected_compliance_type": "NON_COMPLIANT"},
+    }
+    # Unprefixed SkipWaitForResourceRecording applies to every rule
+    assert all(t.skip_wait_for_resource_recording for t in rule_tests)
+    # The deployed stack is shared by every rule test
+    assert all(t.stack_snapshot is stack.stack_snapshot and t.config is stack.config for t in rule_tests)
+
+
+def test_stack_process_outputs_multiple_config_rules_resource_ids_missing(stack):
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "RetentionConfigRuleName", "OutputValue": "retention-rule"},
+            {"OutputKey": "RetentionCompliantResourceIds", "OutputValue": "log-group-one"},
+            {"OutputKey": "EncryptionConfigRuleName", "OutputValue": "encryption-rule"},
+            {"OutputKey": "CompliantResourceIds", "OutputValue": "log-group-two"},
+        ]
+    }
+
+    with pytest.raises(Exception, match="'EncryptionCompliantResourceIds', 'EncryptionNonCompliantResourceIds'"):
+        stack.process_outputs()
+
+
+@patch("time.sleep")
+def test_stack_wait_for_config_resources_multiple_config_rules(mock_time_sleep, stack):
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "RetentionConfigRuleName", "OutputValue": "retention-rule"},
+            {"OutputKey": "RetentionCompliantResourceIds", "OutputValue": "log-group-one,log-group-two"},
+            {"OutputKey": "EncryptionConfigRuleName", "OutputValue": "encryption-rule"},
+            {"OutputKey": "EncryptionNonCompliantResourceIds", "OutputValue": "log-group-two"},
+        ]
+    }
+    stack.process_outputs()
+    stack.config.batch_get_resource_config.side_effect = [
+        {"baseConfigurationItems": [{"resourceId": "log-group-one"}]},
+        {"baseConfigurationItems": [{"resourceId": "log-group-one"}, {"resourceId": "log-group-two"}]},
+    ]
+
+    stack.wait_for_config_resources()
+
+    # Resources shared by several rules are only requested once
+    assert (
+        stack.config.batch_get_resource_config.call_args_list
+        == [
+            call(
+                resourceKeys=[
+                    {"resourceType": "AWS::Logs::LogGroup", "resourceId": "log-group-two"},
+                    {"resourceType": "AWS::Logs::LogGroup", "resourceId": "log-group-one"},
+                ]
+            )
+        ]
+        * 2
+    )
+    assert mock_time_sleep.call_args_list == [call(15)]
+
+
+def test_stack_validate_config_evaluations_multiple_config_rules(stack):
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "RetentionConfigRuleName", "OutputValue": "retention-rule"},
+            {"OutputKey": "RetentionCompliantResourceIds", "OutputValue": "log-group-one"},
+            {"OutputKey": "EncryptionConfigRuleName", "OutputValue": "encryption-rule"},
+            {"OutputKey": "EncryptionCompliantResourceIds", "OutputValue": "log-group-one"},
+        ]
+    }
+    stack.process_outputs()
+    stack.rule_results = []
+    encryption, retention = stack.get_config_rule_tests()
+    for rule_test, compliance_type in [(encryption, "NON_COMPLIANT"), (retention, "COMPLIANT")]:
+        rule_test.resources["log-group-one"]["resource_type"] = "AWS::Logs::LogGroup"
+        rule_test.resources["log-group-one"]["evaluation_result"] = {"ComplianceType": compliance_type}
+
+    with patch.object(Stack, "start_config_rule_evaluation", autospec=True), patch.object(
+        Stack, "wait_for_config_evaluation", autospec=True
+    ) as mock_wait_for_config_evaluation:
+        stack.wait_for_config_evaluations()
+    assert sorted(c.args[0].config_rule_name for c in mock_wait_for_config_evaluation.call_args_list) == [
+        "encryption-rule",
+        "retention-rule",
+    ]
+
+    with pytest.raises(CritterTestFailure, match="Config rule 'encryption-rule' - Failed resource ids"):
+        stack.validate_config_evaluations()
+    assert [(r.config_rule_name, r.passed) for r in stack.rule_results] == [
+        ("encryption-rule", False),
+        ("retention-rule", True),
+    ]
+    assert stack.rule_results[0].failed_resource_ids == ["log-group-one"]
+
+
+def test_stack_wait_for_config_evaluations_stops_on_first_exception(stack):
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "RetentionConfigRuleName", "OutputValue": "retention-rule"},
+            {"OutputKey": "RetentionCompliantResourceIds", "OutputValue": "log-group-one"},
+            {"OutputKey": "EncryptionConfigRuleName", "OutputValue": "encryption-rule"},
+            {"OutputKey": "EncryptionCompliantResourceIds", "OutputValue": "log-group-one"},
+        ]
+    }
+    stack.process_outputs()
+    stack.cfn = MagicMock()
+    stack.cfn.describe_stack_events.return_value = {"StackEvents": [{"Timestamp": "2026-01-01"}]}
+    cancelled = []
+
+    def wait_for_config_evaluation(self):
+        if self.config_rule_name == "encryption-rule":
+            raise Exception("boom")
+        # The other evaluation keeps polling until it is told to stop
+        try:
+            while True:
+                self.evaluation_sleep(Stack.AWS_CONFIG_API_DELAY_SEC)
+        except Exception as e:
+            cancelled.append(e)
+            raise e
+
+    with patch.object(Stack, "start_config_rule_evaluation", autospec=True), patch.object(
+        Stack, "wait_for_config_evaluation", autospec=True, side_effect=wait_for_config_evaluation
+    ):
+        with pytest.raises(Exception, match="boom"):
+            stack.wait_for_config_evaluations()
+
+    assert [type(e).__name__ for e in cancelled] == ["EvaluationCancelled"]
+    # The stack events are read once by the parent and shared with every rule test
+    assert stack.cfn.describe_stack_events.call_count == 1
+    assert all(t.last_stack_event_timestamp == "2026-01-01" for t in stack.get_config_rule_tests())
@@ -0,0 +1,159 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock, call
+import concurrent.futures
+import json
+import time
+import pytest
+
+from critter import Stack
+from critter.stack import TestFailure as CritterTestFailure
+
+t0 = datetime(2022, 1, 1, 0, 0, tzinfo=timezone.utc)
+t1 = datetime(2022, 1, 1, 0, 5, tzinfo=timezone.utc)
+t2 = datetime(2022, 1, 1, 0, 10, tzinfo=timezone.utc)
+
+function_arn = "arn:aws:lambda:us-region-1:111111111111:function:ConfigRule-EvaluationFunction"
+
+
+@pytest.fixture()
+def stack(clients):
+    clients["cloudtrail"] = MagicMock()
+    stack = Stack()
+    stack.stack_name = "Critter-template"
+    stack.initialize_boto_clients(clients)
+    stack.config_rule_name = "my-config-rule"
+    stack.config_rule = {
+        "ConfigRuleName": "my-config-rule",
+        "Source": {"Owner": "CUSTOM_LAMBDA", "SourceIdentifier": function_arn},
+    }
+    stack.evaluation_strategy = Stack.EVALUATION_STRATEGY_WAIT_FOR_CHANGE
+    stack.last_stack_event_timestamp = t0
+    stack.resources = {
+        r_id: {"expected_compliance_type": compliance_type, "evaluation_result": {}}
+        for r_id, compliance_type in [("sg-1", "COMPLIANT"), ("sg-2", "NOT_APPLICABLE"), ("sg-3", "NOT_APPLICABLE")]
+    }
+    stack.config.describe_config_rule_evaluation_status.return_value = {
+        "ConfigRulesEvaluationStatus": [{"LastSuccessfulInvocationTime": t1, "LastSuccessfulEvaluationTime": t2}]
+    }
+    stack.config.get_compliance_details_by_config_rule.return_value = {
+        "EvaluationResults": [
+            {
+                "EvaluationResultIdentifier": {
+                    "EvaluationResultQualifier": {"ResourceType": "AWS::EC2::SecurityGroup", "ResourceId": "sg-1"}
+                },
+                "ComplianceType": "COMPLIANT",
+                "ResultRecordedTime": t1,
+            }
+        ]
+    }
+    return stack
+
+
+def put_evaluations_event(event_time, evaluations, function_name="ConfigRule-EvaluationFunction", error_code=None):
+    detail = {
+        "eventName": "PutEvaluations",
+        "userIdentity": {"arn": f"arn:aws:sts::111111111111:assumed-role/ConfigRuleRole/{function_name}"},
+        "requestParameters": {
+            "evaluations": [
+                {
+                    "complianceResourceType": "AWS::EC2::SecurityGroup",
+                    "complianceResourceId": r_id,
+                    "complianceType": compliance_type,
+                    "orderingTimestamp": "Jan 1, 2022 12:00:00 AM",
+                }
+                for r_id, compliance_type in evaluations
+            ]
+        },
+    }
+    if error_code:
+        detail["errorCode"] = error_code
+    return {"EventName": "PutEvaluations", "EventTime": event_time, "CloudTrailEvent": json.dumps(detail)}
+
+
+def test_stack_wait_for_not_applicable_evaluations(stack):
+    cloudtrail = stack.clients["cloudtrail"]
+    cloudtrail.lookup_events.side_effect = [
+        {
+            "Events": [
+                put_evaluations_event(t2, [("sg-2", "NOT_APPLICABLE")]),
+                # Evaluations of other functions and rejected submissions are ignored
+                put_evaluations_event(t2, [("sg-3", "COMPLIANT")], function_name="OtherFunction"),
+                put_evaluations_event(t2, [("sg-3", "COMPLIANT")], error_code="InvalidParameterValueException"),
+            ],
+            "NextToken": "page-2",
+        },
+        {"Events": [put_evaluations_event(t1, [("sg-2", "COMPLIANT"), ("sg-3", "NOT_APPLICABLE")])]},
+    ]
+
+    stack.wait_for_config_evaluation()
+
+    # Both NOT_APPLICABLE resources are verified by a single lookup of the events since the last stack event
+    assert [c.kwargs.get("NextToken") for c in cloudtrail.lookup_events.call_args_list] == [None, "page-2"]
+    kwargs = cloudtrail.lookup_events.call_args_list[0].kwargs
+    assert kwargs["LookupAttributes"] == [{"AttributeKey": "EventName", "AttributeValue": "PutEvaluations"}]
+    assert kwargs["StartTime"] == t0
+    # The most recent evaluation of each resource is used
+    assert stack.resources["sg-2"]["evaluation_result"]["ComplianceType"] == "NOT_APPLICABLE"
+    assert stack.resources["sg-2"]["evaluation_result"]["ResultRecordedTime"] == t2
+    assert stack.resources["sg-3"]["evaluation_result"]["ComplianceType"] == "NOT_APPLICABLE"
+    assert stack.resources["sg-3"]["resource_type"] == "AWS::EC2::SecurityGroup"
+    assert stack.resources["sg-1"]["evaluation_result"]["ComplianceType"] == "COMPLIANT"
+    stack.validate_config_evaluation()
+
+
+@patch("time.sleep")
+def test_stack_wait_for_not_applicable_evaluations_delivery_delay(mock_time_sleep, stack):
+    stack.resources.pop("sg-3")
+    stack.clients["cloudtrail"].lookup_events.side_effect = [
+        {"Events": []},
+        {"Events": [put_evaluations_event(t2, [("sg-2", "NOT_APPLICABLE")])]},
+    ]
+
+    stack.wait_for_config_evaluation()
+
+    assert mock_time_sleep.call_args_list == [call(Stack.CLOUDTRAIL_API_DELAY_SEC)]
+    assert stack.resources["sg-2"]["evaluation_result"]["ComplianceType"] == "NOT_APPLICABLE"
+
+
+@patch("time.sleep")
+def test_stack_wait_for_not_applicable_evaluations_timeout(mock_time_sleep, stack, caplog):
+    stack.clients["cloudtrail"].lookup_events.return_value = {
+        "Events": [put_evaluations_event(t2, [("sg-2", "NOT_APPLICABLE")])]
+    }
+
+    stack.wait_for_config_evaluation()
+
+    assert mock_time_sleep.call_count == Stack.NOT_APPLICABLE_TIMEOUT_SEC // Stack.CLOUDTRAIL_API_DELAY_SEC - 1
+    assert "for resource ids ['sg-3'] within 1200 seconds" in caplog.text
+    with pytest.raises(CritterTestFailure, match=r"Failed resource ids: \['sg-3'\]"):
+        stack.validate_config_evaluation()
+
+
+def test_stack_wait_for_not_applicable_evaluations_managed_rule(stack, caplog):
+    stack.config_rule["Source"] = {"Owner": "AWS", "SourceIdentifier": "MANAGED_RULE"}
+
+    stack.wait_for_config_evaluation()
+
+    # Evaluations of managed rules are made in an AWS owned account and can not be verified
+    assert list(stack.resources.keys()) == ["sg-1"]
+    assert "Skipping verification of resource ids ['sg-2', 'sg-3']" in caplog.text
+    stack.clients["cloudtrail"].lookup_events.assert_not_called()
+
+
+@patch("boto3.client")
+def test_stack_get_client_threads(mock_boto_client, stack):
+    def new_client(service):
+        time.sleep(0.01)
+        return MagicMock()
+
+    mock_boto_client.side_effect = new_client
+    stack.clients.pop("cloudtrail")
+
+    # Parallel rule evaluations share one lazily created client
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        clients = list(executor.map(lambda _: stack.get_client("cloudtrail"), range(4)))
+    assert mock_boto_client.call_args_list == [call("cloudtrail")]
+    assert all(c is stack.clients["cloudtrail"] for c in clients)
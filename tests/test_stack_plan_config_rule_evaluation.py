@@ -0,0 +1,119 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock
+import pytest
+
+from critter import Stack
+
+managed_rule = {
+    "ConfigRuleName": "my-config-rule",
+    "Scope": {"ComplianceResourceTypes": ["AWS::Logs::LogGroup"]},
+    "Source": {"Owner": "AWS", "SourceIdentifier": "CW_LOGGROUP_RETENTION_PERIOD_CHECK"},
+    "ConfigRuleState": "ACTIVE",
+}
+managed_periodic_rule = {
+    "ConfigRuleName": "my-config-rule",
+    "Source": {"Owner": "AWS", "SourceIdentifier": "IAM_PASSWORD_POLICY"},
+    "MaximumExecutionFrequency": "TwentyFour_Hours",
+    "ConfigRuleState": "ACTIVE",
+}
+custom_change_triggered_rule = {
+    "ConfigRuleName": "my-config-rule",
+    "Scope": {"ComplianceResourceTypes": ["AWS::IAM::Role"]},
+    "Source": {
+        "Owner": "CUSTOM_LAMBDA",
+        "SourceIdentifier": "arn:aws:lambda:us-region-1:111111111111:function:my-function",
+        "SourceDetails": [
+            {"EventSource": "aws.config", "MessageType": "ConfigurationItemChangeNotification"},
+            {"EventSource": "aws.config", "MessageType": "OversizedConfigurationItemChangeNotification"},
+        ],
+    },
+    "ConfigRuleState": "ACTIVE",
+}
+custom_periodic_rule = {
+    "ConfigRuleName": "my-config-rule",
+    "Source": {
+        "Owner": "CUSTOM_LAMBDA",
+        "SourceIdentifier": "arn:aws:lambda:us-region-1:111111111111:function:my-function",
+        "SourceDetails": [
+            {
+                "EventSource": "aws.config",
+                "MessageType": "ScheduledNotification",
+                "MaximumExecutionFrequency": "One_Hour",
+            },
+        ],
+    },
+    "ConfigRuleState": "ACTIVE",
+}
+
+
+@pytest.mark.parametrize(
+    "config_rule,deploy_action_performed,trigger_rule_evaluation,expected_strategy",
+    [
+        (managed_rule, "CREATE", False, Stack.EVALUATION_STRATEGY_WAIT_FOR_CHANGE),
+        (managed_rule, "UPDATE", False, Stack.EVALUATION_STRATEGY_TRIGGER),
+        (managed_rule, None, False, Stack.EVALUATION_STRATEGY_TRIGGER),
+        (managed_rule, "CREATE", True, Stack.EVALUATION_STRATEGY_TRIGGER),
+        (managed_periodic_rule, "CREATE", False, Stack.EVALUATION_STRATEGY_TRIGGER),
+        (custom_change_triggered_rule, "CREATE", False, Stack.EVALUATION_STRATEGY_WAIT_FOR_CHANGE),
+        (custom_change_triggered_rule, None, False, Stack.EVALUATION_STRATEGY_TRIGGER),
+        (custom_periodic_rule, "CREATE", False, Stack.EVALUATION_STRATEGY_TRIGGER),
+    ],
+)
+@patch("boto3.client")
+def test_stack_plan_config_rule_evaluation(
+    mock_boto_client, config_rule, deploy_action_performed, trigger_rule_evaluation, expected_strategy, caplog
+):
+    caplog.set_level("INFO")
+    stack = Stack()
+    stack.initialize_boto_clients()
+    stack.stack_name = "TestStack"
+    stack.config_rule = config_rule
+    stack.config_rule_name = config_rule["ConfigRuleName"]
+    stack.deploy_action_performed = deploy_action_performed
+    stack.trigger_rule_evaluation = trigger_rule_evaluation
+
+    stack.plan_config_rule_evaluation()
+
+    assert stack.evaluation_strategy == expected_strategy
+    assert f"Config rule 'my-config-rule' evaluation strategy: {expected_strategy}" in caplog.text
+
+
+@patch("boto3.client")
+def test_stack_start_config_rule_evaluation_skipped(mock_boto_client):
+    stack = Stack()
+    stack.initialize_boto_clients()
+    stack.config = MagicMock()
+    stack.config_rule_name = "my-config-rule"
+
+    stack.evaluation_strategy = Stack.EVALUATION_STRATEGY_WAIT_FOR_CHANGE
+    stack.start_config_rule_evaluation()
+    assert stack.config.start_config_rules_evaluation.call_count == 0
+
+    stack.evaluation_strategy = Stack.EVALUATION_STRATEGY_TRIGGER
+    stack.start_config_rule_evaluation()
+    assert stack.config.start_config_rules_evaluation.call_count == 1
+
+
+@patch("boto3.client")
+def test_stack_plan_config_rule_evaluation_periodic_rule_outputs(mock_boto_client):
+    stack = Stack()
+    stack.initialize_boto_clients()
+    stack.stack_name = "TestStack"
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "ConfigRuleName", "OutputValue": "my-config-rule"},
+            {"OutputKey": "CompliantResourceIds", "OutputValue": "111111111111"},
+        ]
+    }
+    stack.config.describe_config_rules.return_value = {"ConfigRules": [managed_periodic_rule]}
+    stack.deploy_action_performed = "CREATE"
+    stack.trigger_rule_evaluation = False
+
+    # Periodic rules without a scope have no resource types to wait for
+    stack.process_outputs()
+    assert stack.resource_types == []
+
+    stack.plan_config_rule_evaluation()
+    assert stack.evaluation_strategy == Stack.EVALUATION_STRATEGY_TRIGGER
@@ -0,0 +1,247 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime, timezone
+from unittest.mock import patch, call
+from botocore.exceptions import ClientError
+import copy
+import pytest
+
+from critter import Stack
+from critter.stack import PreflightFailure
+
+t0 = datetime(2022, 1, 1, tzinfo=timezone.utc)
+t1 = datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+template = """
+Resources:
+  SecurityGroup:
+    Type: AWS::EC2::SecurityGroup
+
+Outputs:
+  ConfigRuleName:
+    Value: my-config-rule # Literal rule name
+  OtherConfigRuleName:
+    Value: !Sub "${AWS::StackName}-rule"
+  QuotedConfigRuleName:
+    Value: "quoted-rule"
+  CompliantResourceIds:
+    Value: !Ref SecurityGroup
+  SkipWaitForResourceRecording:
+    Value: 'False'
+"""
+
+
+@pytest.fixture()
+def rules(config_rule):
+    # Config rules described by the mocked config client
+    return {name: config_rule(name) for name in ["my-config-rule", "quoted-rule"]}
+
+
+@pytest.fixture()
+def stack(clients, rules):
+    stack = Stack()
+    stack.stack_name = "Critter-template"
+    stack.template_body = template
+    stack.initialize_boto_clients(clients)
+    stack.config.describe_configuration_recorders.return_value = {
+        "ConfigurationRecorders": [{"name": "default", "recordingGroup": {"allSupported": True}}]
+    }
+    stack.config.describe_configuration_recorder_status.return_value = {
+        "ConfigurationRecordersStatus": [{"name": "default", "recording": True, "lastStatus": "Success"}]
+    }
+    stack.config.describe_config_rules.side_effect = lambda ConfigRuleNames: {
+        "ConfigRules": [rules[ConfigRuleNames[0]]]
+    }
+    stack.config.describe_config_rule_evaluation_status.return_value = {
+        "ConfigRulesEvaluationStatus": [{"LastSuccessfulInvocationTime": t0}]
+    }
+    return stack
+
+
+def test_stack_template_literal_outputs():
+    stack = Stack()
+    stack.template_body = template
+    assert stack.template_literal_outputs() == {
+        "ConfigRuleName": "my-config-rule",
+        "QuotedConfigRuleName": "quoted-rule",
+        "SkipWaitForResourceRecording": "False",
+    }
+
+    stack.template_body = '{"Outputs": {"ConfigRuleName": {"Value": "json-rule"}, "Id": {"Value": {"Ref": "R"}}}}'
+    assert stack.template_literal_outputs() == {"ConfigRuleName": "json-rule"}
+
+    # Values the scanner is not sure about are unknown before deploying
+    stack.template_body = """
+Outputs:  # Outputs
+  ConfigRuleName:
+    Value: my-rule#not-a-comment
+  OtherConfigRuleName:
+    Value: 'it''s-a-rule'
+  QuotedConfigRuleName:
+    Value: "quoted-rule" # Comment
+  MultilineConfigRuleName:
+    Value: >
+      folded-rule
+"""
+    assert stack.template_literal_outputs() == {"QuotedConfigRuleName": "quoted-rule"}
+
+
+def test_stack_preflight_check(stack, config_rule):
+    stack.checked_config_rules = None
+
+    stack.preflight_check(stack.template_config_rule_tests())
+
+    # Only the rules named by literal outputs are known before deploying
+    assert stack.checked_config_rules == {"my-config-rule", "quoted-rule"}
+    assert stack.config.describe_configuration_recorders.call_count == 1
+    assert stack.config.describe_config_rule_evaluation_status.call_args_list == [
+        call(ConfigRuleNames=["my-config-rule"]),
+        call(ConfigRuleNames=["quoted-rule"]),
+    ]
+
+    # Rules named by intrinsic functions are checked once the stack outputs are processed, the recorder is not read
+    # again
+    other_rule_test = copy.copy(stack)
+    other_rule_test.config_rule_name = "Critter-template-rule"
+    other_rule_test.config_rule = config_rule("Critter-template-rule")
+    other_rule_test.resource_types = ["AWS::EC2::SecurityGroup"]
+    stack.check_config_rules([other_rule_test])
+    assert stack.checked_config_rules == {"my-config-rule", "quoted-rule", "Critter-template-rule"}
+    assert stack.config.describe_configuration_recorders.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "rule_kwargs,responses,match",
+    [
+        (
+            {},
+            {
+                "describe_configuration_recorder_status": {
+                    "ConfigurationRecordersStatus": [{"name": "default", "recording": False}]
+                }
+            },
+            "configuration recorder 'default' is stopped",
+        ),
+        ({"state": "DELETING"}, {}, "'my-config-rule' is DELETING, it must be ACTIVE"),
+        (
+            {},
+            {
+                "describe_configuration_recorders": {
+                    "ConfigurationRecorders": [
+                        {
+                            "name": "default",
+                            "recordingGroup": {"allSupported": False, "resourceTypes": ["AWS::EC2::Instance"]},
+                        }
+                    ]
+                }
+            },
+            r"does not record the resource types \['AWS::EC2::SecurityGroup'\]",
+        ),
+        (
+            {},
+            {
+                "describe_configuration_recorders": {
+                    "ConfigurationRecorders": [
+                        {
+                            "name": "default",
+                            "recordingGroup": {
+                                "allSupported": False,
+                                "exclusionByResourceTypes": {"resourceTypes": ["AWS::EC2::SecurityGroup"]},
+                                "recordingStrategy": {"useOnly": "EXCLUSION_BY_RESOURCE_TYPES"},
+                            },
+                        }
+                    ]
+                }
+            },
+            "does not record the resource types",
+        ),
+        (
+            {"resource_types": ["AWS::IAM::Role"]},
+            {
+                "describe_configuration_recorders": {
+                    "ConfigurationRecorders": [
+                        {
+                            "name": "default",
+                            "recordingGroup": {"allSupported": True, "includeGlobalResourceTypes": False},
+                        }
+                    ]
+                }
+            },
+            r"does not record the resource types \['AWS::IAM::Role'\]",
+        ),
+        (
+            {},
+            {
+                "describe_config_rule_evaluation_status": {
+                    "ConfigRulesEvaluationStatus": [
+                        {
+                            "LastSuccessfulInvocationTime": t0,
+                            "LastFailedInvocationTime": t1,
+                            "LastErrorCode": "AccessDenied",
+                            "LastErrorMessage": "Config cannot invoke the Lambda function",
+                        }
+                    ]
+                }
+            },
+            "most recent evaluation failed with AccessDenied: Config cannot invoke the Lambda function",
+        ),
+    ],
+)
+def test_stack_preflight_check_failures(stack, rules, config_rule, rule_kwargs, responses, match):
+    rules["my-config-rule"] = config_rule("my-config-rule", **rule_kwargs)
+    for method, response in responses.items():
+        getattr(stack.config, method).return_value = response
+
+    with pytest.raises(PreflightFailure, match=match):
+        stack.preflight_check(stack.template_config_rule_tests())
+
+
+def test_stack_preflight_check_no_recorder(stack):
+    stack.config.describe_configuration_recorders.return_value = {"ConfigurationRecorders": []}
+    with pytest.raises(PreflightFailure, match="no configuration recorder"):
+        stack.preflight_check([])
+
+
+def test_stack_preflight_check_recorder_access_denied(stack, caplog):
+    stack.config.describe_configuration_recorders.side_effect = ClientError(
+        {"Error": {"Code": "AccessDeniedException", "Message": "denied"}}, "DescribeConfigurationRecorders"
+    )
+
+    # The rules are still checked
+    stack.preflight_check(stack.template_config_rule_tests())
+    assert "Unable to check the AWS Config configuration recorder" in caplog.text
+    assert stack.config.describe_config_rule_evaluation_status.call_count == 2
+
+
+@patch.object(Stack, "deploy", autospec=True)
+def test_stack_run_preflight_failure(mock_deploy, stack, rules, config_rule, tmp_path):
+    template_file = tmp_path / "template.yml"
+    template_file.write_text(template)
+    stack.configure(str(template_file), delete_stack="Always", run_state_file=str(tmp_path / "state.json"))
+    rules["my-config-rule"] = config_rule("my-config-rule", state="DELETING")
+
+    result = stack.run()
+
+    # The test fails before the stack is created, so there is nothing to delete
+    assert isinstance(result.error, PreflightFailure)
+    mock_deploy.assert_not_called()
+    stack.cfn.delete_stack.assert_not_called()
+
+
+@patch.object(Stack, "deploy", autospec=True)
+def test_stack_run_config_rule_not_found(mock_deploy, stack, rules, tmp_path):
+    template_file = tmp_path / "template.yml"
+    template_file.write_text(template)
+    stack.configure(str(template_file), delete_stack="Always", run_state_file=str(tmp_path / "state.json"))
+    del rules["my-config-rule"]
+    stack.config.describe_config_rules.side_effect = ClientError(
+        {"Error": {"Code": "NoSuchConfigRuleException", "Message": "not found"}}, "DescribeConfigRules"
+    )
+
+    result = stack.run()
+
+    # A stack with the same name may be kept from an earlier run, it is not deleted by a test that never deployed
+    assert "Config rule 'my-config-rule' not found" in str(result.error)
+    mock_deploy.assert_not_called()
+    stack.cfn.delete_stack.assert_not_called()
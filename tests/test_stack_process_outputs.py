@@ -25,15 +25,16 @@ rule = {
 def test_stack_process_outputs(mock_boto_client, mock_boto_resource, mock_time_sleep, caplog):
     stack = Stack()
     stack.initialize_boto_clients()
-    stack.stack = MagicMock()
-    stack.stack.outputs = [
-        {"OutputKey": "MyCustomKey", "OutputValue": "MyCustomValue"},
-        {"OutputKey": "ConfigRuleName", "OutputValue": "my-config-rule"},
-        {"OutputKey": "CompliantResourceIds", "OutputValue": "compliant-one,compliant-two"},
-        {"OutputKey": "NonCompliantResourceIds", "OutputValue": "non-compliant-one, non-compliant-two"},
-        {"OutputKey": "NotApplicableResourceIds", "OutputValue": "not-applicable-one"},
-        {"OutputKey": "DelayAfterDeploy", "OutputValue": "5"},
-    ]
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "MyCustomKey", "OutputValue": "MyCustomValue"},
+            {"OutputKey": "ConfigRuleName", "OutputValue": "my-config-rule"},
+            {"OutputKey": "CompliantResourceIds", "OutputValue": "compliant-one,compliant-two"},
+            {"OutputKey": "NonCompliantResourceIds", "OutputValue": "non-compliant-one, non-compliant-two"},
+            {"OutputKey": "NotApplicableResourceIds", "OutputValue": "not-applicable-one"},
+            {"OutputKey": "DelayAfterDeploy", "OutputValue": "5"},
+        ]
+    }
     stack.deploy_action_performed = "UPDATE"
 
     stack.config = MagicMock()
@@ -76,8 +77,7 @@ def test_stack_process_outputs(mock_boto_client, mock_boto_resource, mock_time_s
 def test_stack_process_outputs_config_rule_name_missing(mock_boto_client, mock_boto_resource):
     stack = Stack()
     stack.initialize_boto_clients()
-    stack.stack = MagicMock()
-    stack.stack.outputs = []
+    stack.stack_snapshot = {"Outputs": []}
     stack.stack_name = "MyStack"
 
     with pytest.raises(Exception, match="Missing required output 'ConfigRuleName' on CloudFormation stack 'MyStack'"):
@@ -89,10 +89,11 @@ def test_stack_process_outputs_config_rule_name_missing(mock_boto_client, mock_b
 def test_stack_process_outputs_resource_ids_missing(mock_boto_client, mock_boto_resource):
     stack = Stack()
     stack.initialize_boto_clients()
-    stack.stack = MagicMock()
-    stack.stack.outputs = [
-        {"OutputKey": "ConfigRuleName", "OutputValue": "my-config-rule"},
-    ]
+    stack.stack_snapshot = {
+        "Outputs": [
+            {"OutputKey": "ConfigRuleName", "OutputValue": "my-config-rule"},
+        ]
+    }
 
     stack.config = MagicMock()
     stack.config.describe_config_rules.return_value = {"ConfigRules": [rule]}
@@ -0,0 +1,152 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock, call
+import base64
+import hashlib
+import io
+import os
+import zipfile
+import pytest
+
+from critter import Stack
+
+function_arn = "arn:aws:lambda:us-region-1:111111111111:function:ConfigRule-EvaluationFunction"
+
+custom_rule = {
+    "ConfigRuleName": "custom-rule",
+    "Scope": {"ComplianceResourceTypes": ["AWS::IAM::Role"]},
+    "Source": {
+        "Owner": "CUSTOM_LAMBDA",
+        "SourceIdentifier": function_arn,
+        "SourceDetails": [{"MessageType": "ConfigurationItemChangeNotification", "EventSource": "aws.config"}],
+    },
+    "ConfigRuleState": "ACTIVE",
+}
+managed_rule = {
+    "ConfigRuleName": "managed-rule",
+    "Scope": {"ComplianceResourceTypes": ["AWS::Logs::LogGroup"]},
+    "Source": {"Owner": "AWS", "SourceIdentifier": "CW_LOGGROUP_RETENTION_PERIOD_CHECK"},
+    "ConfigRuleState": "ACTIVE",
+}
+
+
+@pytest.fixture()
+def code_dir(tmp_path):
+    code = tmp_path / "lambda"
+    (code / "__pycache__").mkdir(parents=True)
+    (code / "rule.py").write_text("def handler(event, context):\n    pass\n")
+    (code / "__pycache__" / "rule.cpython-311.pyc").write_bytes(b"bytecode")
+    return str(code)
+
+
+def code_sha256(zip_file):
+    return base64.b64encode(hashlib.sha256(zip_file).digest()).decode("utf-8")
+
+
+@pytest.fixture()
+def stack(clients, code_dir):
+    clients["lambda"] = MagicMock()
+    stack = Stack()
+    stack.initialize_boto_clients(clients)
+    stack.config_rule_name = custom_rule["ConfigRuleName"]
+    stack.config_rule = custom_rule
+    stack.rule_code = {"": code_dir}
+    stack.updated_config_rules = set()
+    return stack
+
+
+def test_stack_package_rule_code(code_dir):
+    stack = Stack()
+    zip_file = stack.package_rule_code(code_dir)
+
+    assert zipfile.ZipFile(io.BytesIO(zip_file)).namelist() == ["rule.py"]
+    # Unchanged code has the same hash regardless of file modification times
+    os.utime(os.path.join(code_dir, "rule.py"), (0, 0))
+    assert stack.package_rule_code(code_dir) == zip_file
+
+
+@patch("time.sleep")
+def test_stack_update_rule_code(mock_time_sleep, stack, code_dir):
+    lambda_client = stack.clients["lambda"]
+    lambda_client.get_function_configuration.side_effect = [
+        {"FunctionName": "ConfigRule-EvaluationFunction", "CodeSha256": "previous"},
+        {"FunctionName": "ConfigRule-EvaluationFunction", "LastUpdateStatus": "InProgress"},
+        {"FunctionName": "ConfigRule-EvaluationFunction", "LastUpdateStatus": "Successful"},
+    ]
+
+    stack.update_rule_code([stack])
+    # Each rule is updated once, before deploying or once its name is known from the stack outputs
+    stack.update_rule_code([stack])
+
+    zip_file = stack.package_rule_code(code_dir)
+    assert lambda_client.update_function_code.call_args_list == [call(FunctionName=function_arn, ZipFile=zip_file)]
+    assert lambda_client.get_function_configuration.call_args_list == [call(FunctionName=function_arn)] * 3
+    assert mock_time_sleep.call_args_list == [call(Stack.LAMBDA_UPDATE_DELAY_SEC)]
+    assert stack.updated_config_rules == {"custom-rule"}
+
+
+def test_stack_update_rule_code_unchanged(stack, code_dir, caplog):
+    caplog.set_level("INFO")
+    stack.rule_code = {"custom-rule": code_dir}
+    lambda_client = stack.clients["lambda"]
+    lambda_client.get_function_configuration.return_value = {
+        "FunctionName": "ConfigRule-EvaluationFunction",
+        "CodeSha256": code_sha256(stack.package_rule_code(code_dir)),
+    }
+
+    stack.update_rule_code([stack])
+
+    lambda_client.update_function_code.assert_not_called()
+    assert "'ConfigRule-EvaluationFunction' code is unchanged" in caplog.text
+
+
+def test_stack_update_rule_code_failed(stack):
+    stack.clients["lambda"].get_function_configuration.side_effect = [
+        {"FunctionName": "ConfigRule-EvaluationFunction", "CodeSha256": "previous"},
+        {
+            "FunctionName": "ConfigRule-EvaluationFunction",
+            "LastUpdateStatus": "Failed",
+            "LastUpdateStatusReason": "Unzipped size must be smaller than 262144000 bytes",
+        },
+    ]
+
+    with pytest.raises(Exception, match="code update failed: Unzipped size must be smaller"):
+        stack.update_rule_code([stack])
+
+
+def test_stack_update_rule_code_managed_rule(stack, code_dir):
+    # Code for every rule skips managed rules
+    stack.config_rule_name = managed_rule["ConfigRuleName"]
+    stack.config_rule = managed_rule
+    stack.update_rule_code([stack])
+    assert stack.rule_code_dir() is None
+    stack.clients["lambda"].get_function_configuration.assert_not_called()
+
+    stack.rule_code = {"managed-rule": code_dir}
+    stack.updated_config_rules = set()
+    with pytest.raises(Exception, match="'managed-rule' is owned by AWS, only the code of CUSTOM_LAMBDA rules"):
+        stack.update_rule_code([stack])
+
+
+def test_stack_plan_config_rule_evaluation_rule_code(stack):
+    stack.trigger_rule_evaluation = False
+    stack.deploy_action_performed = "CREATE"
+
+    stack.plan_config_rule_evaluation()
+
+    # Change triggered evaluations of the new resources may have run the previous code
+    assert stack.evaluation_strategy == Stack.EVALUATION_STRATEGY_TRIGGER
+
+
+@patch("boto3.client")
+def test_cli_rule_code(mock_boto_client, code_dir, tmp_path):
+    template = tmp_path / "template.yml"
+    template.write_text("Resources: {}")
+
+    stack = Stack()
+    stack.parse_args([str(template), "--rule-code", code_dir, f"other-rule={code_dir}"])
+    assert stack.rule_code == {"": code_dir, "other-rule": code_dir}
+
+    with pytest.raises(Exception, match="--rule-code Lambda function code 'missing' not found"):
+        Stack().parse_args([str(template), "--rule-code", "missing"])
@@ -0,0 +1,96 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, call
+import pytest
+
+from critter import Stack
+from critter.stack import DeployFailure
+from critter.status_poller import StackStatusPoller
+
+
+@pytest.fixture()
+def stack(clients):
+    stack = Stack()
+    stack.initialize_boto_clients(clients)
+    stack.stack_name = "TestStack"
+    stack.last_stack_event_id = None
+    return stack
+
+
+def test_stack_new_stack_events_next_token(stack, stack_event):
+    stack.last_stack_event_id = "1"
+    stack.cfn.describe_stack_events.side_effect = [
+        {
+            "StackEvents": [stack_event("5", "CREATE_COMPLETE"), stack_event("4", "CREATE_IN_PROGRESS")],
+            "NextToken": "a",
+        },
+        {
+            "StackEvents": [stack_event("3", "CREATE_IN_PROGRESS"), stack_event("2", "CREATE_IN_PROGRESS")],
+            "NextToken": "b",
+        },
+        {"StackEvents": [stack_event("1", "CREATE_IN_PROGRESS")], "NextToken": "c"},
+    ]
+
+    events = stack.new_stack_events()
+
+    # Paging stops at the last seen event and events are returned oldest first
+    assert [e["EventId"] for e in events] == ["2", "3", "4", "5"]
+    assert stack.last_stack_event_id == "5"
+    assert stack.cfn.describe_stack_events.call_args_list == [
+        call(StackName="TestStack"),
+        call(StackName="TestStack", NextToken="a"),
+        call(StackName="TestStack", NextToken="b"),
+    ]
+
+
+@patch.object(StackStatusPoller, "POLL_INTERVAL_SEC", 0)
+def test_stack_tail_stack_events_first_failure(stack, stack_event, list_stacks, caplog):
+    caplog.set_level("INFO")
+    stack.cfn.list_stacks.side_effect = [
+        list_stacks(("TestStack", "CREATE_IN_PROGRESS")),
+        list_stacks(("TestStack", "CREATE_IN_PROGRESS")),
+        list_stacks(("TestStack", "ROLLBACK_IN_PROGRESS")),
+    ]
+    stack.cfn.describe_stack_events.side_effect = [
+        {"StackEvents": [stack_event("1", "CREATE_IN_PROGRESS")]},
+        {
+            "StackEvents": [
+                stack_event("5", "ROLLBACK_IN_PROGRESS"),
+                stack_event("4", "CREATE_FAILED", "Role", "AWS::IAM::Role", "Resource creation cancelled"),
+                stack_event("3", "CREATE_FAILED", "LogGroup", "AWS::Logs::LogGroup", "Invalid retention"),
+                stack_event("2", "CREATE_IN_PROGRESS", "LogGroup", "AWS::Logs::LogGroup"),
+                stack_event("1", "CREATE_IN_PROGRESS"),
+            ]
+        },
+    ]
+
+    with pytest.raises(DeployFailure, match=r"Resource 'LogGroup' \(AWS::Logs::LogGroup\) CREATE_FAILED: Invalid"):
+        stack.tail_stack_events("CREATE_COMPLETE", "The stack is kept for debugging.")
+    # Stack events are only read when the stack status changes
+    assert stack.cfn.list_stacks.call_count == 3
+    assert stack.cfn.describe_stack_events.call_count == 2
+    assert "CREATE_IN_PROGRESS               AWS::Logs::LogGroup                      LogGroup" in caplog.text
+    # Later events are not read once the first failure is reported
+    assert "Resource creation cancelled" not in caplog.text
+
+
+@patch.object(StackStatusPoller, "POLL_INTERVAL_SEC", 0)
+def test_stack_tail_stack_events_stack_status(stack, list_stacks):
+    stack.cfn.describe_stack_events.return_value = {"StackEvents": []}
+    stack.cfn.list_stacks.side_effect = [
+        list_stacks(("TestStack", "CREATE_IN_PROGRESS")),
+        list_stacks(("TestStack", "CREATE_COMPLETE")),
+        # A deleted stack is missing from the filtered results
+        list_stacks(),
+    ]
+
+    # No terminal stack event is seen, the shared stack status poller ends the tail
+    stack.tail_stack_events("CREATE_COMPLETE")
+    assert stack.cfn.list_stacks.call_count == 2
+    assert stack.last_stack_event_timestamp is None
+    stack.cfn.describe_stacks.assert_not_called()
+
+    with pytest.raises(DeployFailure, match="failed with stack status DELETE_COMPLETE"):
+        stack.tail_stack_events("CREATE_COMPLETE")
+    assert stack.cfn.describe_stack_events.call_count == 2
@@ -0,0 +1,96 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, call
+from botocore.exceptions import ClientError
+import boto3
+import hashlib
+import pytest
+from moto import mock_aws
+
+from critter import Stack
+
+
+@pytest.fixture()
+def s3():
+    with mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket="template-bucket")
+        yield s3
+
+
+@pytest.fixture()
+def stack(s3, clients, test_stacks_cw_loggroup_retention_period):
+    stack = Stack()
+    stack.initialize_boto_clients({**clients, "s3": s3})
+    stack.template_file = "./template.yml"
+    stack.template_body = test_stacks_cw_loggroup_retention_period
+    stack.template_bucket = "template-bucket"
+    stack.template_prefix = "critter-templates/"
+    return stack
+
+
+def test_stack_upload_template(stack, s3, test_stacks_cw_loggroup_retention_period, caplog):
+    caplog.set_level("INFO")
+    digest = hashlib.sha256(test_stacks_cw_loggroup_retention_period.encode("utf-8")).hexdigest()
+    key = f"critter-templates/{digest}.yml"
+    url = f"https://template-bucket.s3.us-east-1.amazonaws.com/{key}"
+
+    assert stack.get_template_location() == {"TemplateURL": url}
+    assert f"Uploaded template './template.yml' to 's3://template-bucket/{key}'" in caplog.text
+
+    body = s3.get_object(Bucket="template-bucket", Key=key)["Body"].read().decode("utf-8")
+    assert body == test_stacks_cw_loggroup_retention_period
+
+    # Uploading the same content again reuses the existing object
+    with patch.object(s3, "put_object") as mock_put_object:
+        assert stack.get_template_location() == {"TemplateURL": url}
+        assert mock_put_object.call_count == 0
+    assert f"Reusing template 's3://template-bucket/{key}'" in caplog.text
+
+    # Changed content is stored under a new key
+    stack.template_body = test_stacks_cw_loggroup_retention_period + "\n# changed\n"
+    stack.get_template_location()
+    assert s3.list_objects_v2(Bucket="template-bucket")["KeyCount"] == 2
+
+
+def test_stack_deploy_template_url(stack):
+    stack.stack_name = "TestStack"
+    stack.cfn_capabilities = []
+    stack.stack_tags = []
+    stack.trigger_rule_evaluation = False
+    stack.cfn.create_stack.side_effect = ClientError({"Error": {"Code": "AlreadyExistsException"}}, "CreateStack")
+    stack.cfn.describe_stack_events.return_value = {
+        "StackEvents": [
+            {
+                "EventId": "1",
+                "LogicalResourceId": "TestStack",
+                "ResourceType": "AWS::CloudFormation::Stack",
+                "ResourceStatus": "UPDATE_COMPLETE",
+            }
+        ]
+    }
+
+    stack.cfn.list_stacks.return_value = {
+        "StackSummaries": [{"StackName": "TestStack", "StackStatus": "UPDATE_COMPLETE"}]
+    }
+
+    stack.deploy()
+
+    template_url = stack.template_location["TemplateURL"]
+    assert template_url.startswith("https://template-bucket.s3.us-east-1.amazonaws.com/critter-templates/")
+    assert stack.cfn.create_stack.call_args_list == [
+        call(StackName="TestStack", TemplateURL=template_url, OnFailure="DELETE", Capabilities=[], Tags=[])
+    ]
+    assert stack.cfn.update_stack.call_args_list == [
+        call(StackName="TestStack", TemplateURL=template_url, DisableRollback=True, Capabilities=[], Tags=[])
+    ]
+
+
+def test_stack_template_url_bucket_region(stack, s3):
+    s3.create_bucket(Bucket="eu-bucket", CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+    stack.template_bucket = "eu-bucket"
+    stack.template_prefix = "my templates/"
+
+    # The URL points at the bucket's region and the key is percent-encoded
+    assert stack.upload_template().startswith("https://eu-bucket.s3.eu-west-2.amazonaws.com/my%20templates/")
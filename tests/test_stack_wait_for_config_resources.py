@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from unittest.mock import patch, MagicMock, call
+import pytest
 
 from critter import Stack
 
@@ -38,7 +39,9 @@ def test_stack_wait_for_config_resources(mock_boto_client, mock_boto_resource, m
     stack.config = MagicMock()
     # TODO: test a loop, return less than all of the resources on the first
     # config.batch_get_resource_config api call, then return all resources on the second call
-    stack.config.batch_get_resource_config.return_value = {"baseConfigurationItems": resources.keys()}
+    stack.config.batch_get_resource_config.return_value = {
+        "baseConfigurationItems": [{"resourceId": r_id} for r_id in resources.keys()]
+    }
 
     stack.wait_for_config_resources()
 
@@ -84,3 +87,23 @@ def test_stack_wait_for_config_resources_not_resource_types(mock_boto_client, mo
         "Warning - Skipping waiting for resources to be recorded by AWS Config. Config rule "
         "'test-rule' scope does not specify applicable resource types." in caplog.text
     )
+
+
+@patch("time.sleep")
+@patch("boto3.client")
+def test_stack_wait_for_config_resources_timeout(mock_boto_client, mock_time_sleep, caplog):
+    stack = Stack()
+    stack.initialize_boto_clients()
+    stack.skip_wait_for_resource_recording = False
+    stack.resource_types = rule["Scope"]["ComplianceResourceTypes"]
+    stack.config_rule_name = rule["ConfigRuleName"]
+    stack.resources = resources
+    stack.config = MagicMock()
+    stack.config.batch_get_resource_config.return_value = {"baseConfigurationItems": [{"resourceId": "compliant-one"}]}
+
+    with pytest.raises(Exception, match="were not recorded by AWS Config within 900 seconds"):
+        stack.wait_for_config_resources()
+
+    polls = Stack.RESOURCE_RECORDING_TIMEOUT_SEC // Stack.AWS_CONFIG_API_DELAY_SEC + 1
+    assert stack.config.batch_get_resource_config.call_count == polls
+    assert caplog.text.count("Still waiting for resources to be recorded by AWS Config") == 1
@@ -0,0 +1,59 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import MagicMock, call
+import concurrent.futures
+import threading
+
+from critter import status_poller
+from critter.status_poller import StackStatusPoller
+
+
+def test_status_poller_shares_refreshes():
+    stack_names = [f"Critter-test-{i}" for i in range(20)]
+    calls = []
+    lock = threading.Lock()
+
+    def list_stacks(**kwargs):
+        with lock:
+            calls.append(kwargs)
+            # Each refresh reads two pages
+            refresh = (len(calls) + 1) // 2
+        # Every stack finishes on the third refresh
+        status = "CREATE_COMPLETE" if refresh >= 3 else "CREATE_IN_PROGRESS"
+        summaries = [{"StackName": name, "StackStatus": status} for name in stack_names]
+        if "NextToken" not in kwargs:
+            return {"StackSummaries": summaries[:10], "NextToken": "page-2"}
+        return {"StackSummaries": summaries[10:]}
+
+    cfn = MagicMock()
+    cfn.list_stacks.side_effect = list_stacks
+    poller = StackStatusPoller(cfn, poll_interval=0.2)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(stack_names)) as executor:
+        futures = [
+            executor.submit(poller.wait, name, lambda status: status.endswith("_COMPLETE")) for name in stack_names
+        ]
+        assert [f.result() for f in futures] == ["CREATE_COMPLETE"] * len(stack_names)
+
+    # The waiting stacks share the ListStacks refreshes instead of describing each stack
+    assert cfn.list_stacks.call_count <= 2 * 4
+    cfn.describe_stacks.assert_not_called()
+    assert poller.tracked == {}
+    assert poller.statuses == {}
+
+
+def test_status_poller_deleted_stack():
+    cfn = MagicMock()
+    cfn.list_stacks.return_value = {"StackSummaries": [{"StackName": "Other", "StackStatus": "CREATE_COMPLETE"}]}
+    poller = StackStatusPoller(cfn, poll_interval=0)
+
+    assert poller.wait("Critter-test", lambda status: True) == "DELETE_COMPLETE"
+    assert cfn.list_stacks.call_args_list == [call(StackStatusFilter=StackStatusPoller.STACK_STATUS_FILTER)]
+    assert "DELETE_COMPLETE" not in StackStatusPoller.STACK_STATUS_FILTER
+
+
+def test_status_poller_for_client():
+    cfn = MagicMock()
+    assert status_poller.for_client(cfn) is status_poller.for_client(cfn)
+    assert status_poller.for_client(cfn) is not status_poller.for_client(MagicMock())
@@ -0,0 +1,138 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+from unittest.mock import patch, MagicMock, mock_open, call
+from botocore.exceptions import ClientError
+import pytest
+
+from critter import Stack
+from critter.throttle import RateLimiter, ThrottlingError, TokenBucket
+
+
+def throttling_error(code="ThrottlingException"):
+    return ClientError({"Error": {"Code": code, "Message": "Rate exceeded"}}, "StartConfigRulesEvaluation")
+
+
+@patch("time.sleep")
+def test_rate_limiter_call_retries_throttling(mock_time_sleep):
+    limiter = RateLimiter()
+    fn = MagicMock(side_effect=[throttling_error("LimitExceededException"), throttling_error(), {"ok": True}])
+
+    assert limiter.call("config.StartConfigRulesEvaluation", fn, ConfigRuleNames=["rule"]) == {"ok": True}
+    assert fn.call_args_list == [call(ConfigRuleNames=["rule"])] * 3
+    assert mock_time_sleep.call_args_list == [call(15), call(30)]
+
+    bucket = limiter.bucket("config.StartConfigRulesEvaluation")
+    # Two throttles halve the rate twice, one success recovers a tenth of the configured rate
+    assert bucket.rate == pytest.approx(0.35)
+
+
+@patch("time.sleep")
+def test_rate_limiter_call_retry_budget_exceeded(mock_time_sleep):
+    limiter = RateLimiter(max_retries=2)
+    fn = MagicMock(side_effect=throttling_error())
+
+    with pytest.raises(ThrottlingError, match="'config.BatchGetResourceConfig' is still throttled after 2 retries"):
+        limiter.call("config.BatchGetResourceConfig", fn)
+    assert fn.call_count == 3
+    assert mock_time_sleep.call_args_list == [call(15), call(30)]
+
+
+def test_rate_limiter_call_other_errors_raised():
+    limiter = RateLimiter()
+    fn = MagicMock(side_effect=ClientError({"Error": {"Code": "NoSuchConfigRuleException"}}, "DescribeConfigRules"))
+
+    with pytest.raises(ClientError):
+        limiter.call("config.DescribeConfigRules", fn)
+    assert fn.call_count == 1
+
+
+@patch("time.sleep")
+def test_rate_limiter_call_limit_exceeded_raised(mock_time_sleep):
+    limiter = RateLimiter()
+    fn = MagicMock(
+        side_effect=ClientError(
+            {"Error": {"Code": "LimitExceededException", "Message": "Limit for stacks exceeded"}}, "CreateStack"
+        )
+    )
+
+    # Only StartConfigRulesEvaluation uses LimitExceededException for throttling, a stack quota is not retried
+    with pytest.raises(ClientError, match="Limit for stacks exceeded"):
+        limiter.call("cloudformation.CreateStack", fn, StackName="Critter-template")
+    assert fn.call_count == 1
+    mock_time_sleep.assert_not_called()
+
+
+def test_rate_limiter_configure():
+    limiter = RateLimiter(rates={"config.DescribeConfigRules": 0.5})
+    assert limiter.bucket("config.DescribeConfigRules").rate == 0.5
+    assert limiter.bucket("config.StartConfigRulesEvaluation").rate == 1
+    assert limiter.bucket("sts.GetCallerIdentity").rate == RateLimiter.DEFAULT_RATE
+
+    with pytest.raises(Exception, match="must be greater than 0"):
+        limiter.configure(rates={"config.DescribeConfigRules": 0})
+
+
+@patch("time.sleep")
+@patch("time.monotonic")
+def test_token_bucket_acquire(mock_time_monotonic, mock_time_sleep):
+    mock_time_monotonic.return_value = 100.0
+    bucket = TokenBucket(rate=2)
+
+    bucket.acquire()
+    assert mock_time_sleep.call_args_list == []
+
+    bucket.acquire()
+    assert mock_time_sleep.call_args_list == [call(0.5)]
+
+    mock_time_monotonic.return_value = 101.0
+    bucket.acquire()
+    assert mock_time_sleep.call_args_list == [call(0.5)]
+
+
+@patch("boto3.client")
+@patch("builtins.open", mock_open(read_data="file contents"))
+def test_cli_api_rate_limit(mock_boto_client):
+    stack = Stack()
+    stack.parse_args(
+        [
+            "./template.yml",
+            "--api-rate-limit",
+            "config.StartConfigRulesEvaluation=0.2",
+            "cloudformation.DescribeStacks=1",
+            "--max-throttle-retries",
+            "3",
+        ]
+    )
+    assert stack.limiter.rates["config.StartConfigRulesEvaluation"] == 0.2
+    assert stack.limiter.rates["cloudformation.DescribeStacks"] == 1
+    assert stack.limiter.max_retries == 3
+
+    stack.initialize_boto_clients()
+    assert (
+        mock_boto_client.return_value.meta.events.register.call_args_list
+        == [call("before-call.*.*", stack.limiter._before_call)] * 3
+    )
+
+    with pytest.raises(Exception, match="must be formatted as OPERATION=TPS"):
+        Stack().parse_args(["./template.yml", "--api-rate-limit", "config.StartConfigRulesEvaluation"])
+
+    # Restore the process-wide defaults for other tests
+    stack.limiter.configure(max_retries=RateLimiter.DEFAULT_MAX_RETRIES)
+
+
+@patch("time.sleep")
+@patch("time.monotonic", return_value=100.0)
+def test_token_bucket_acquire_sleeps_outside_lock(mock_time_monotonic, mock_time_sleep):
+    bucket = TokenBucket(2)
+    bucket.acquire()
+
+    def sleep(seconds):
+        # Another thread can reserve the next token while this one sleeps
+        assert not bucket._lock.locked()
+
+    mock_time_sleep.side_effect = sleep
+    bucket.acquire()
+    bucket.acquire()
+    # Each reservation waits for its own place in the queue
+    assert mock_time_sleep.call_args_list == [call(0.5), call(1.0)]